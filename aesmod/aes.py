@@ -23,11 +23,29 @@
 
 
 import os
+import mmap
+import struct
+import functools
+import operator
+import contextlib
 import hashlib
 import hmac
-import pickle
 import base64
 import random
+import tempfile
+
+from aesmod import gf, kdf
+from libcrypt import instrument
+from libcrypt.xor import fixed_xor
+
+
+# The cipher state is kept row-major (state[4 * row + column]) while
+# blocks and expanded keys are column-major, so loading or storing a block
+# is the TRANSPOSE permutation (its own inverse). In this layout ShiftRows
+# rotates the four bytes of row r left by r, done in place by swaps.
+TRANSPOSE = tuple(4 * (i % 4) + i // 4 for i in range(16))
+
+_transpose = operator.itemgetter(*TRANSPOSE)
 
 
 class AES(object):
@@ -82,6 +100,15 @@ class AES(object):
             0x04, 0x7e, 0xba, 0x77, 0xd6, 0x26, 0xe1, 0x69, 0x14, 0x63, 0x55,
             0x21, 0x0c, 0x7d]
 
+    # the same boxes as bytes.translate() tables
+    sbox_table = bytes(sbox)
+    rsbox_table = bytes(rsbox)
+
+    def __init__(self):
+        # the block being processed, reused by every encrypt_block and
+        # decrypt_block call: an instance must not be shared between threads
+        self.state = bytearray(16)
+
     def get_sbox_value(self, num):
         return self.sbox[num]
 
@@ -148,79 +175,64 @@ class AES(object):
         return expanded_key
 
     def add_round_key(self, state, round_key):
-        for i in range(16):
-            state[i] ^= round_key[i]
+        ''' round_key is in state layout, as a big endian int '''
+        state[:] = (int.from_bytes(state, 'big') ^ round_key).to_bytes(16,
+            'big')
         return state
 
     def create_round_key(self, expanded_key, round_key_pointer):
-        round_key = [0] * 16
-        for i in range(4):
-            for j in range(4):
-                round_key[j * 4 + i] = expanded_key[
-                    round_key_pointer + i * 4 + j]
-        return round_key
+        return int.from_bytes(bytes(_transpose(
+            expanded_key[round_key_pointer:round_key_pointer + 16])), 'big')
 
     def galois_multiplication(self, a, b):
-        p = 0
-        for counter in range(8):
-            if b & 1:
-                p ^= a
-            hi_bit_set = a & 0x80
-            a <<= 1
-            a &= 0xFF
-            if hi_bit_set:
-                a ^= 0x1b
-            b >>= 1
-        return p
+        return gf.MUL[b][a]
 
     def sub_bytes(self, state, is_inv):
-        if is_inv:
-            getter = self.get_sbox_invert
-        else:
-            getter = self.get_sbox_value
-        for i in range(16):
-            state[i] = getter(state[i])
+        state[:] = state.translate(self.rsbox_table if is_inv else
+            self.sbox_table)
         return state
 
     def shift_rows(self, state, is_inv):
-        for i in range(4):
-            state = self.shift_row(state, i * 4, i, is_inv)
-        return state
-
-    def shift_row(self, state, state_pointer, nbr, is_inv):
-        for i in range(nbr):
-            if is_inv:
-                state[state_pointer:state_pointer + 4] = (
-                    state[state_pointer + 3:state_pointer + 4] +
-                    state[state_pointer:state_pointer + 3])
-            else:
-                state[state_pointer:state_pointer + 4] = (
-                    state[state_pointer + 1:state_pointer + 4] +
-                    state[state_pointer:state_pointer + 1])
+        # row r is rotated left by r (right by r for the inverse)
+        if is_inv:
+            state[4], state[5], state[6], state[7] = (
+                state[7], state[4], state[5], state[6])
+            state[12], state[13], state[14], state[15] = (
+                state[13], state[14], state[15], state[12])
+        else:
+            state[4], state[5], state[6], state[7] = (
+                state[5], state[6], state[7], state[4])
+            state[12], state[13], state[14], state[15] = (
+                state[15], state[12], state[13], state[14])
+        state[8], state[9], state[10], state[11] = (
+            state[10], state[11], state[8], state[9])
         return state
 
     def mix_columns(self, state, is_inv):
+        if is_inv:
+            m0, m1, m2, m3 = gf.MUL14, gf.MUL9, gf.MUL13, gf.MUL11
+        else:
+            m0, m1, m2, m3 = gf.MUL2, gf.MUL1, gf.MUL1, gf.MUL3
+        # column i is state[i], state[i + 4], state[i + 8], state[i + 12]
         for i in range(4):
-            column = state[i:i + 16:4]
-            column = self.mix_column(column, is_inv)
-            state[i:i + 16:4] = column
+            c0, c1, c2, c3 = state[i], state[i + 4], state[i + 8], state[i + 12]
+            state[i] = m0[c0] ^ m1[c3] ^ m2[c2] ^ m3[c1]
+            state[i + 4] = m0[c1] ^ m1[c0] ^ m2[c3] ^ m3[c2]
+            state[i + 8] = m0[c2] ^ m1[c1] ^ m2[c0] ^ m3[c3]
+            state[i + 12] = m0[c3] ^ m1[c2] ^ m2[c1] ^ m3[c0]
         return state
 
     def mix_column(self, column, is_inv):
+        # multiply-by-constant tables for the matrix coefficients
         if is_inv:
-            mult = [14, 9, 13, 11]
+            m0, m1, m2, m3 = gf.MUL14, gf.MUL9, gf.MUL13, gf.MUL11
         else:
-            mult = [2, 1, 1, 3]
-        cpy = list(column)
-        g = self.galois_multiplication
-        column[0] = (g(cpy[0], mult[0]) ^ g(cpy[3], mult[1]) ^
-            g(cpy[2], mult[2]) ^ g(cpy[1], mult[3]))
-        column[1] = (g(cpy[1], mult[0]) ^ g(cpy[0], mult[1]) ^
-            g(cpy[3], mult[2]) ^ g(cpy[2], mult[3]))
-        column[2] = (g(cpy[2], mult[0]) ^ g(cpy[1], mult[1]) ^
-            g(cpy[0], mult[2]) ^ g(cpy[3], mult[3]))
-        column[3] = (g(cpy[3], mult[0]) ^ g(cpy[2], mult[1]) ^
-            g(cpy[1], mult[2]) ^ g(cpy[0], mult[3]))
+            m0, m1, m2, m3 = gf.MUL2, gf.MUL1, gf.MUL1, gf.MUL3
+        c0, c1, c2, c3 = column
+        column[0] = m0[c0] ^ m1[c3] ^ m2[c2] ^ m3[c1]
+        column[1] = m0[c1] ^ m1[c0] ^ m2[c3] ^ m3[c2]
+        column[2] = m0[c2] ^ m1[c1] ^ m2[c0] ^ m3[c3]
+        column[3] = m0[c3] ^ m1[c2] ^ m2[c1] ^ m3[c0]
         return column
 
     def aes_round(self, state, round_key):
@@ -237,85 +249,119 @@ class AES(object):
         state = self.mix_columns(state, True)
         return state
 
-    def aes_main(self, state, expanded_key, n_rounds):
-        state = self.add_round_key(state,
-            self.create_round_key(expanded_key, 0))
+    def aes_main(self, state, round_keys, n_rounds):
+        state = self.add_round_key(state, round_keys[0])
         i = 1
         while i < n_rounds:
-            state = self.aes_round(state,
-                self.create_round_key(expanded_key, 16 * i))
+            state = self.aes_round(state, round_keys[i])
             i += 1
         state = self.sub_bytes(state, False)
         state = self.shift_rows(state, False)
-        state = self.add_round_key(state,
-            self.create_round_key(expanded_key, 16 * n_rounds))
+        state = self.add_round_key(state, round_keys[n_rounds])
         return state
 
-    def aes_inv_main(self, state, expanded_key, n_rounds):
-        state = self.add_round_key(state,
-            self.create_round_key(expanded_key, 16 * n_rounds))
+    def aes_inv_main(self, state, round_keys, n_rounds):
+        state = self.add_round_key(state, round_keys[n_rounds])
         i = n_rounds - 1
         while i > 0:
-            state = self.aes_inv_round(state,
-                self.create_round_key(expanded_key, 16 * i))
+            state = self.aes_inv_round(state, round_keys[i])
             i -= 1
         state = self.shift_rows(state, True)
         state = self.sub_bytes(state, True)
-        state = self.add_round_key(state,
-            self.create_round_key(expanded_key, 0))
+        state = self.add_round_key(state, round_keys[0])
         return state
 
-    def encrypt(self, data, key):
-        result = bytearray(16)
-        block = bytearray(16)
+    @staticmethod
+    def n_rounds(key):
         if len(key) == 16:
-            n_rounds = 10
+            return 10
         elif len(key) == 24:
-            n_rounds = 12
+            return 12
         elif len(key) == 32:
-            n_rounds = 14
-        else:
-            raise ValueError("key must be 16, 24 or 32 bytes long")
+            return 14
+        raise ValueError("key must be 16, 24 or 32 bytes long")
+
+    @instrument.timed('aes.expand_key')
+    def expand_round_keys(self, key):
+        '''
+            Return (n_rounds, round_keys) where round_keys holds the
+            n_rounds + 1 keys already transposed to the state layout by
+            create_round_key, ready for add_round_key.
+        '''
+        n_rounds = self.n_rounds(key)
         expanded_key_size = 16 * (n_rounds + 1)
-        for i in range(4):
-            for j in range(4):
-                block[(i + (j * 4))] = data[(i * 4) + j]
         expanded_key = self.expand_key(key, len(key), expanded_key_size)
-        block = self.aes_main(block, expanded_key, n_rounds)
-        for k in range(4):
-            for l in range(4):
-                result[(k * 4) + l] = block[(k + (l * 4))]
-        return bytes(result)
+        return n_rounds, tuple(self.create_round_key(expanded_key, 16 * i)
+            for i in range(n_rounds + 1))
+
+    def key_schedule(self, key):
+        return _cached_schedule(type(self), bytes(key))
+
+    def encrypt_block(self, data, schedule):
+        n_rounds, round_keys = schedule
+        state = self.state
+        state[:] = _transpose(data)
+        self.aes_main(state, round_keys, n_rounds)
+        return bytes(_transpose(state))
+
+    def decrypt_block(self, data, schedule):
+        n_rounds, round_keys = schedule
+        state = self.state
+        state[:] = _transpose(data)
+        self.aes_inv_main(state, round_keys, n_rounds)
+        return bytes(_transpose(state))
+
+    def encrypt(self, data, key):
+        return self.encrypt_block(data, self.key_schedule(key))
 
     def decrypt(self, data, key):
-        result = bytearray(16)
-        block = bytearray(16)
-        if len(key) == 16:
-            n_rounds = 10
-        elif len(key) == 24:
-            n_rounds = 12
-        elif len(key) == 32:
-            n_rounds = 14
-        else:
-            raise ValueError("key must be 16, 24 or 32 bytes long")
-        expanded_key_size = 16 * (n_rounds + 1)
-        for i in range(4):
-            for j in range(4):
-                block[(i + (j * 4))] = data[(i * 4) + j]
-        expanded_key = self.expand_key(key, len(key), expanded_key_size)
-        block = self.aes_inv_main(block, expanded_key, n_rounds)
-        for k in range(4):
-            for l in range(4):
-                result[(k * 4) + l] = block[(k + (l * 4))]
-        return bytes(result)
+        return self.decrypt_block(data, self.key_schedule(key))
+
+
+# Expanded keys are cached per (engine, key) so that callers passing raw
+# keys block after block only pay for the key schedule once per key.
+KEY_CACHE_SIZE = 128
+
+
+@functools.lru_cache(maxsize=KEY_CACHE_SIZE)
+def _cached_schedule(engine, key):
+    return engine().expand_round_keys(key)
+
+
+def clear_key_cache():
+    _cached_schedule.cache_clear()
+
+
+instrument.gauge('aes.key_cache', lambda: _cached_schedule.cache_info()._asdict())
+
+
+class AESCipher(object):
+    '''
+        AES bound to a single key.
+
+        The key schedule is computed once on construction and reused
+        for every block, e.g. AESCipher(key).encrypt(block). It lives only
+        as long as the cipher: it does not go through the shared key
+        cache, where one-off keys would evict raw-key callers' entries.
+    '''
+
+    def __init__(self, key, engine=AES):
+        self.aes = engine()
+        self.schedule = self.aes.expand_round_keys(bytes(key))
+
+    def encrypt(self, data):
+        return self.aes.encrypt_block(data, self.schedule)
+
+    def decrypt(self, data):
+        return self.aes.decrypt_block(data, self.schedule)
 
 
 class AESModeOfOperationCBC (object):
 
-    def __init__(self, iv):
+    def __init__(self, iv, engine=AES):
         if len(iv) != 16:
             raise ValueError("iv must be 16 bytes long")
-        self.aes = AES()
+        self.engine = engine
         self.iv = iv
 
     @staticmethod
@@ -332,50 +378,240 @@ class AESModeOfOperationCBC (object):
     def check_padding(data):
         if not data or len(data) % 16:
             raise ValueError("padding error")
-        if data[-1] > 16:
+        if not 0 < data[-1] <= 16:
             raise ValueError("padding error")
         if not all(i == data[-1] for i in data[-data[-1]:]):
             raise ValueError("padding error")
 
     @staticmethod
     def xor(a, b):
-        return bytes(i ^ j for i, j in zip(a, b))
+        n = min(len(a), len(b))
+        return fixed_xor(a[:n], b[:n])
 
     def encrypt(self, data, key):
-        data, p, result = self.pad(data), self.iv, b''
-        for i in range(len(data) // 16):
-            plain = data[i * 16:i * 16 + 16]
-            ciph = self.aes.encrypt(self.xor(plain, p), key)
-            result, p = result + ciph, ciph
-        return result
+        encryptor = CBCEncryptor(key, self.iv, self.engine)
+        return encryptor.update(data) + encryptor.finalize()
 
     def decrypt(self, data, key):
-        result, p = b'', self.iv
-        for i in range(len(data) // 16):
-            ciph = data[i * 16:i * 16 + 16]
-            plain = self.xor(self.aes.decrypt(ciph, key), p)
+        decryptor = CBCDecryptor(key, self.iv, self.engine)
+        return decryptor.update(data) + decryptor.finalize()
+
+    def decrypt_blocks(self, data, key):
+        '''
+            Decrypt whole blocks without checking or removing padding.
+
+            Each plaintext block only depends on its own ciphertext block
+            and the previous one, so any block range can be decrypted on
+            its own given the ciphertext block preceding it as the iv.
+        '''
+        if len(data) % 16:
+            raise ValueError("data must be a multiple of 16 bytes long")
+        cipher = AESCipher(key, self.engine)
+        instrument.count('aes.blocks', len(data) // 16)
+        view, result, p = memoryview(data), bytearray(len(data)), self.iv
+        for i in range(0, len(data), 16):
+            ciph = bytes(view[i:i + 16])
+            result[i:i + 16] = xor_block(cipher.decrypt(ciph), p)
             p = ciph
-            result += plain
-        self.check_padding(result)
-        return self.unpad(result)
+        return bytes(result)
+
+
+class AESModeOfOperationECB (object):
+
+    def __init__(self, engine=AES):
+        self.engine = engine
+
+    def encrypt_blocks(self, data, key):
+        return self.crypt_blocks(data, AESCipher(key, self.engine).encrypt)
+
+    def decrypt_blocks(self, data, key):
+        return self.crypt_blocks(data, AESCipher(key, self.engine).decrypt)
+
+    @staticmethod
+    def crypt_blocks(data, transform):
+        if len(data) % 16:
+            raise ValueError("data must be a multiple of 16 bytes long")
+        instrument.count('aes.blocks', len(data) // 16)
+        view, result = memoryview(data), bytearray(len(data))
+        for i in range(0, len(data), 16):
+            result[i:i + 16] = transform(view[i:i + 16])
+        return bytes(result)
+
+    def encrypt(self, data, key):
+        return self.encrypt_blocks(AESModeOfOperationCBC.pad(data), key)
+
+    def decrypt(self, data, key):
+        plain = self.decrypt_blocks(data, key)
+        AESModeOfOperationCBC.check_padding(plain)
+        return AESModeOfOperationCBC.unpad(plain)
+
+
+class AESModeOfOperationCTR (object):
+    '''
+        Counter mode with a 16 byte initial counter block incremented
+        as a 128-bit big endian integer (NIST SP 800-38A).
+    '''
+
+    def __init__(self, counter, engine=AES):
+        if len(counter) != 16:
+            raise ValueError("counter must be 16 bytes long")
+        self.engine = engine
+        self.counter = int.from_bytes(counter, 'big')
+
+    def keystream(self, key, offset, n_blocks):
+        ''' n_blocks of keystream starting offset blocks into the stream '''
+        cipher = AESCipher(key, self.engine)
+        start = self.counter + offset
+        instrument.count('aes.blocks', n_blocks)
+        result = bytearray(16 * n_blocks)
+        for i in range(n_blocks):
+            counter = ((start + i) & 0xffffffffffffffffffffffffffffffff)
+            result[i * 16:i * 16 + 16] = cipher.encrypt(
+                counter.to_bytes(16, 'big'))
+        return bytes(result)
+
+    def crypt(self, data, key, offset=0):
+        if not data:
+            return b''
+        stream = self.keystream(key, offset, (len(data) + 15) // 16)
+        return (int.from_bytes(data, 'big') ^
+            int.from_bytes(stream[:len(data)], 'big')).to_bytes(
+                len(data), 'big')
+
+    encrypt = decrypt = crypt
+
+
+def xor_block(a, b):
+    return fixed_xor(a, b)
+
+
+class _CBCStream(object):
+    '''
+        Incremental CBC transform.
+
+        update() accepts chunks of any size and returns every block
+        that can be emitted so far; at most one block is buffered
+        between calls. update_into() writes the same output into a
+        caller supplied writable buffer and returns the byte count.
+    '''
+
+    def __init__(self, key, iv, engine=AES):
+        if len(iv) != 16:
+            raise ValueError("iv must be 16 bytes long")
+        self.cipher = AESCipher(key, engine)
+        self.p = bytes(iv)
+        self.pending = bytearray()
+        self.finalized = False
+
+    def output_size(self, length):
+        ''' bytes update() returns for an input of the given length '''
+        return self.ready(len(self.pending) + length)
+
+    def update(self, data):
+        out = bytearray(self.output_size(len(data)))
+        self.update_into(data, out)
+        return bytes(out)
+
+    @instrument.timed('aes.cbc')
+    def update_into(self, data, out):
+        if self.finalized:
+            raise ValueError("stream already finalized")
+        data = memoryview(data).cast('B')
+        n = self.output_size(len(data))
+        out = memoryview(out).cast('B')
+        if len(out) < n:
+            raise ValueError("output buffer too small")
+        instrument.count('aes.blocks', n // 16)
+        written, pos = 0, 0
+        if n and self.pending:
+            pos = 16 - len(self.pending)
+            self.pending += data[:pos]
+            out[0:16] = self.transform(bytes(self.pending))
+            del self.pending[:]
+            written = 16
+        while written < n:
+            out[written:written + 16] = self.transform(data[pos:pos + 16])
+            written, pos = written + 16, pos + 16
+        self.pending += data[pos:]
+        return n
+
+
+class CBCEncryptor(_CBCStream):
+
+    @staticmethod
+    def ready(length):
+        return length - length % 16
+
+    def transform(self, block):
+        self.p = self.cipher.encrypt(xor_block(block, self.p))
+        return self.p
+
+    def finalize(self):
+        if self.finalized:
+            raise ValueError("stream already finalized")
+        self.finalized = True
+        instrument.count('aes.blocks')
+        return self.transform(AESModeOfOperationCBC.pad(bytes(self.pending)))
+
+
+class CBCDecryptor(_CBCStream):
+
+    @staticmethod
+    def ready(length):
+        # the last block is held back until finalize() strips the padding
+        return max(0, (length - 1) - (length - 1) % 16)
+
+    def transform(self, block):
+        block = bytes(block)
+        plain = xor_block(self.cipher.decrypt(block), self.p)
+        self.p = block
+        return plain
+
+    def finalize(self):
+        if self.finalized:
+            raise ValueError("stream already finalized")
+        self.finalized = True
+        if len(self.pending) != 16:
+            raise ValueError("padding error")
+        instrument.count('aes.blocks')
+        plain = self.transform(self.pending)
+        AESModeOfOperationCBC.check_padding(plain)
+        return AESModeOfOperationCBC.unpad(plain)
+
+
+def cbc_encrypt(data, key, iv, engine=AES):
+    mo = AESModeOfOperationCBC(iv, engine)
+    return mo.encrypt(data, key)
+
+
+def cbc_decrypt(data, key, iv, engine=AES):
+    mo = AESModeOfOperationCBC(iv, engine)
+    return mo.decrypt(data, key)
+
+
+def ecb_encrypt(data, key, engine=AES):
+    mo = AESModeOfOperationECB(engine)
+    return mo.encrypt(data, key)
 
 
-def cbc_encrypt(data, key, iv):
-    mo = AESModeOfOperationCBC(iv)
+def ecb_decrypt(data, key, engine=AES):
+    mo = AESModeOfOperationECB(engine)
+    return mo.decrypt(data, key)
+
+
+def ctr_encrypt(data, key, counter, engine=AES):
+    mo = AESModeOfOperationCTR(counter, engine)
     return mo.encrypt(data, key)
 
 
-def cbc_decrypt(data, key, iv):
-    mo = AESModeOfOperationCBC(iv)
+def ctr_decrypt(data, key, counter, engine=AES):
+    mo = AESModeOfOperationCTR(counter, engine)
     return mo.decrypt(data, key)
 
 
+@instrument.timed('aes.stretch')
 def stretch(passphrase, iterations, salt):
-    passphrase = passphrase.encode()
-    key = hashlib.sha256(passphrase + salt)
-    for i in range(iterations):
-        key = hashlib.sha256(key.digest() + passphrase + salt)
-    return key.digest()
+    return kdf.sha256_chain(passphrase, iterations, salt)
 
 
 def wrap(text, length):
@@ -384,56 +620,255 @@ def wrap(text, length):
         for i in range(x))
 
 
-def encrypt(data, passphrase, iterations=8192, salt_length=32):
+# Binary envelope shared by encrypt() and encrypt_file():
+#
+#   header | salt | HMAC-SHA256 | CBC ciphertext
+#
+# The header is fixed size (see below), salt_length bytes of salt follow
+# it, and the MAC covers header, salt and ciphertext (encrypt-then-MAC).
+MAGIC = b'AESF'
+VERSION = 1
+# magic, version, flags, kdf, iterations, salt length, iv
+header = struct.Struct('>4sBBBIB16s')
+MAC_SIZE = 32
+FLAG_TEXT = 0x01      # payload was a str, encoded as utf-8
+FLAG_PADDED = 0x02    # plaintext ends with random bytes and their count
+FILE_CHUNK_SIZE = 1 << 16
+
+
+def pack_header(flags, kdf_id, iterations, salt, iv):
+    return header.pack(MAGIC, VERSION, flags, kdf_id, iterations, len(salt),
+        iv) + salt
+
+
+def parse_header(view):
+    '''
+        Return (flags, kdf, iterations, salt, iv, mac, ciphertext offset)
+
+        The kdf and its work factor are checked against kdf.check() here,
+        so a crafted header cannot make key derivation run for long or
+        allocate much before the MAC is verified.
+    '''
+    magic, version, flags, kdf_id, iterations, salt_length, iv = (
+        header.unpack_from(view))
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("unknown envelope format")
+    kdf.check(kdf_id, iterations)
+    start = header.size + salt_length
+    offset = start + MAC_SIZE
+    if len(view) < offset:
+        raise ValueError("truncated envelope")
+    return (flags, kdf_id, iterations, bytes(view[header.size:start]), iv,
+        bytes(view[start:offset]), offset)
+
+
+@instrument.timed('aes.armor')
+def armor(envelope):
+    return wrap(base64.b64encode(envelope).decode(), 64)
+
+
+@instrument.timed('aes.dearmor')
+def dearmor(text):
+    if isinstance(text, str):
+        text = text.encode()
+    return base64.b64decode(b''.join(text.split()), validate=True)
+
+
+@instrument.timed('aes.encrypt')
+def encrypt(data, passphrase, iterations=8192, salt_length=32, armored=True,
+        engine=AES, kdf_id=kdf.SHA256_CHAIN):
     '''
         Encrypt data using AES256-CBC
 
-        This function encrypts the data (bytes) using
+        This function encrypts the data (bytes or str) using
         a streteched version of the passphrase (sha256)
         with a sha256 hmac for authentication. And returns
-        a urlsafe base64 encoded string containing the
-        pickled components of the secret.
+        a binary envelope (see pack_header) or, by default,
+        its base64 armored form wrapped at 64 columns.
 
         The passphrase is a string of arbitrary length.
         The iterations and salt_length arguments have
         an impact on the speed of the key generating
-        function. They should be as high as possible.
+        function. They should be as high as possible
+        (see kdf.calibrate); kdf_id selects the backend.
         A random number (0-128) of random bytes is added
         to the plain text to further obfuscate its length.
-        When decrypting, The plain text is also checked
-        for integrity using its sha256 checksum.
 
     '''
+    flags = FLAG_PADDED
+    if isinstance(data, str):
+        data, flags = data.encode(), flags | FLAG_TEXT
     rand = os.urandom(random.randint(0, 128))
-    data = pickle.dumps((data, rand))
-    h = hashlib.sha256(data).hexdigest()
     salt, iv = os.urandom(salt_length), os.urandom(16)
-    key = stretch(passphrase, iterations, salt)
-    ciphertext = cbc_encrypt(data, key, iv)
-    data = pickle.dumps((ciphertext, salt, iterations, iv))
-    mac = hmac.new(key, data, hashlib.sha256).digest()
-    data = pickle.dumps((data, mac, h))
-    ciph = base64.b64encode(data).decode()
-    return wrap(ciph, 64)
-
-
-def decrypt(data, passphrase):
+    key = kdf.derive(passphrase, iterations, salt, kdf_id, cache=None)
+    prefix = pack_header(flags, kdf_id, iterations, salt, iv)
+    ciphertext = cbc_encrypt(b''.join((data, rand, bytes([len(rand)]))),
+        key, iv, engine)
+    with instrument.timer('aes.hmac'):
+        mac = hmac.new(key, prefix, hashlib.sha256)
+        mac.update(ciphertext)
+    envelope = b''.join((prefix, mac.digest(), ciphertext))
+    instrument.count('aes.bytes_in', len(data))
+    instrument.count('aes.bytes_out', len(envelope))
+    return armor(envelope) if armored else envelope
+
+
+def raw_envelope(data):
+    ''' Return the binary envelope for raw or armored input '''
+    if isinstance(data, str) or data[:len(MAGIC)] != MAGIC:
+        return dearmor(data)
+    return data
+
+
+def open_envelope(envelope, key, engine=AES):
+    ''' Verify and decrypt a binary envelope with an already derived key '''
+    view = memoryview(envelope)
+    flags, _, _, _, iv, mac, offset = parse_header(view)
+    with instrument.timer('aes.hmac'):
+        check = hmac.new(key, view[:offset - MAC_SIZE], hashlib.sha256)
+        check.update(view[offset:])
+        if not hmac.compare_digest(mac, check.digest()):
+            raise ValueError("mac mismatch")
+    decryptor = CBCDecryptor(key, iv, engine)
+    plain = decryptor.update(view[offset:]) + decryptor.finalize()
+    if flags & FLAG_PADDED:
+        plain = plain[:-1 - plain[-1]]
+    instrument.count('aes.bytes_in', len(envelope))
+    instrument.count('aes.bytes_out', len(plain))
+    return plain.decode() if flags & FLAG_TEXT else plain
+
+
+@instrument.timed('aes.decrypt')
+def decrypt(data, passphrase, engine=AES):
     try:
-        data = data.replace(" ", "").replace("\n", "")
-        data = data.replace("\t", "").replace("\r", "")
-        data = base64.b64decode(data.encode(), validate=True)
-        data, mac, h = pickle.loads(data)
-        ciphertext, salt, iterations, iv = pickle.loads(data)
-        key = stretch(passphrase, iterations, salt)
-        assert mac == hmac.new(key, data, hashlib.sha256).digest()
-        plain_text = cbc_decrypt(ciphertext, key, iv)
-        assert h == hashlib.sha256(plain_text).hexdigest()
-        data, rand = pickle.loads(plain_text)
-        return data
+        envelope = raw_envelope(data)
+        _, kdf_id, iterations, salt, _, _, _ = parse_header(
+            memoryview(envelope))
+        key = kdf.derive(passphrase, iterations, salt, kdf_id)
+        return open_envelope(envelope, key, engine)
     except Exception as e:
         print(e)
     raise ValueError("decryption error")
 
+
+@contextlib.contextmanager
+def _mapped(f, access=mmap.ACCESS_READ):
+    if os.fstat(f.fileno()).st_size == 0:
+        yield b''
+    else:
+        with mmap.mmap(f.fileno(), 0, access=access) as m:
+            yield m
+
+
+@contextlib.contextmanager
+def _replacing(src, dst):
+    '''
+        Yield a binary file to be written in place of dst.
+
+        It is a temporary file in dst's directory that is renamed onto dst
+        only when the block succeeds, and removed otherwise, so dst is
+        never left truncated or half written. src and dst must differ.
+    '''
+    if os.path.exists(dst) and os.path.samefile(src, dst):
+        raise ValueError("src and dst are the same file")
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(dst)),
+        prefix='.' + os.path.basename(dst) + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w+b') as fout:
+            yield fout
+        os.replace(tmp, dst)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+@instrument.timed('aes.encrypt_file')
+def encrypt_file(src, dst, passphrase, iterations=8192, salt_length=32,
+        engine=AES, kdf_id=kdf.SHA256_CHAIN):
+    '''
+        Encrypt the file src into dst using AES-CBC and HMAC-SHA256
+
+        Both files are memory-mapped: the plaintext is streamed chunk by
+        chunk through the cipher straight into the pre-sized destination
+        and the MAC is updated over the same pass, so files larger than
+        memory can be encrypted. dst is a binary envelope without flags;
+        it is only replaced once the whole envelope has been written.
+    '''
+    salt, iv = os.urandom(salt_length), os.urandom(16)
+    key = kdf.derive(passphrase, iterations, salt, kdf_id, cache=None)
+    prefix = pack_header(0, kdf_id, iterations, salt, iv)
+    offset = len(prefix) + MAC_SIZE
+    mac = hmac.new(key, prefix, hashlib.sha256)
+    encryptor = CBCEncryptor(key, iv, engine)
+    with open(src, 'rb') as fin, _replacing(src, dst) as fout:
+        size = os.fstat(fin.fileno()).st_size
+        fout.truncate(offset + size - size % 16 + 16)
+        with _mapped(fin) as source, memoryview(source) as view, \
+                _mapped(fout, mmap.ACCESS_WRITE) as target, \
+                memoryview(target) as out:
+            out[:len(prefix)] = prefix
+            pos = offset
+            for i in range(0, size, FILE_CHUNK_SIZE):
+                n = encryptor.update_into(view[i:i + FILE_CHUNK_SIZE],
+                    out[pos:])
+                with instrument.timer('aes.hmac'):
+                    mac.update(out[pos:pos + n])
+                pos += n
+            last = encryptor.finalize()
+            out[pos:pos + 16] = last
+            mac.update(last)
+            out[len(prefix):offset] = mac.digest()
+    instrument.count('aes.bytes_in', size)
+    instrument.count('aes.bytes_out', pos + 16)
+
+
+@instrument.timed('aes.decrypt_file')
+def decrypt_file(src, dst, passphrase, engine=AES):
+    '''
+        Decrypt a file written by encrypt_file into dst
+
+        The ciphertext is decrypted into a memory-mapped destination
+        while the MAC is checked over the same pass. The plaintext goes to
+        a temporary file that replaces dst only once the MAC has matched;
+        on any failure dst is left untouched and ValueError is raised.
+    '''
+    with open(src, 'rb') as fin:
+        try:
+            with _replacing(src, dst) as fout, _mapped(fin) as source, \
+                    memoryview(source) as view:
+                size = _decrypt_view(view, fout, passphrase, engine)
+                fout.truncate(size)
+        except Exception as e:
+            raise ValueError("decryption error") from e
+
+
+def _decrypt_view(view, fout, passphrase, engine):
+    flags, kdf_id, iterations, salt, iv, mac, offset = parse_header(view)
+    if flags:
+        raise ValueError("not a file envelope")
+    key = kdf.derive(passphrase, iterations, salt, kdf_id)
+    check = hmac.new(key, view[:offset - MAC_SIZE], hashlib.sha256)
+    decryptor = CBCDecryptor(key, iv, engine)
+    size = len(view) - offset
+    fout.truncate(size)
+    with view[offset:] as body, _mapped(fout, mmap.ACCESS_WRITE) as target, \
+            memoryview(target) as out:
+        pos = 0
+        for i in range(0, size, FILE_CHUNK_SIZE):
+            chunk = body[i:i + FILE_CHUNK_SIZE]
+            with instrument.timer('aes.hmac'):
+                check.update(chunk)
+            pos += decryptor.update_into(chunk, out[pos:])
+            chunk.release()
+        if not hmac.compare_digest(check.digest(), mac):
+            raise ValueError("mac mismatch")
+        last = decryptor.finalize()
+        out[pos:pos + len(last)] = last
+    instrument.count('aes.bytes_in', len(view))
+    instrument.count('aes.bytes_out', pos + len(last))
+    return pos + len(last)
+
+
 if __name__ == "__main__":
     # execute only if run as a script
     data = 'this is a simple test'
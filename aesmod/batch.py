@@ -0,0 +1,139 @@
+''' Batch decryption of many aes.encrypt envelopes '''
+#
+# Only the headers are parsed in the calling process. Records are read a
+# window at a time and grouped by (kdf, salt, iterations). A record alone
+# in its group is one pool task that stretches the passphrase and opens
+# it, so fresh-salt records derive their keys in parallel. A larger group
+# (e.g. many records under one tenant salt) has its key derived once in
+# the calling process through the kdf cache, so later windows hit it, and
+# its envelopes are split into one chunk per worker. A window is
+# submitted before the previous one is collected, so at most two windows
+# of records are in memory, and results are yielded in input order.
+#
+
+import collections
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from aesmod import kdf
+from aesmod.aes import AES, raw_envelope, parse_header, open_envelope
+
+
+Result = collections.namedtuple('Result', 'data error')
+
+
+def _prepare(record):
+    ''' Return (group, envelope), group being (kdf_id, salt, iterations) '''
+    envelope = bytes(raw_envelope(record))
+    _, kdf_id, iterations, salt, _, _, _ = parse_header(memoryview(envelope))
+    return (kdf_id, bytes(salt), iterations), envelope
+
+
+def _open_group(passphrase, group, envelopes, engine=AES, key=None):
+    ''' Open every envelope with the group's key, derived once if not given '''
+    if key is None:
+        kdf_id, salt, iterations = group
+        try:
+            key = kdf.derive(passphrase, iterations, salt, kdf_id)
+        except Exception as e:
+            return [Result(None, e)] * len(envelopes)
+    results = []
+    for envelope in envelopes:
+        try:
+            results.append(Result(open_envelope(envelope, key, engine), None))
+        except Exception as e:
+            results.append(Result(None, e))
+    return results
+
+
+def _submit(pool, records, passphrase, engine, workers):
+    '''
+        Group one window of records and submit its tasks.
+
+        Returns a list with, per record, either a Result (the header or
+        the key derivation failed) or (future, index into that future's
+        results).
+    '''
+    slots, groups = [], {}
+    for record in records:
+        try:
+            group, envelope = _prepare(record)
+        except Exception as e:
+            slots.append(Result(None, e))
+            continue
+        envelopes = groups.setdefault(group, [])
+        slots.append((group, len(envelopes)))
+        envelopes.append(envelope)
+    tasks = {}
+    for group, envelopes in groups.items():
+        if len(envelopes) == 1:
+            tasks[group] = ([pool.submit(_open_group, passphrase, group,
+                envelopes, engine)], 1)
+            continue
+        kdf_id, salt, iterations = group
+        try:
+            key = kdf.derive(passphrase, iterations, salt, kdf_id)
+        except Exception as e:
+            tasks[group] = (e, 0)
+            continue
+        size = -(-len(envelopes) // workers)
+        tasks[group] = ([pool.submit(_open_group, passphrase, group,
+            envelopes[i:i + size], engine, key)
+            for i in range(0, len(envelopes), size)], size)
+    for i, slot in enumerate(slots):
+        if isinstance(slot, Result):
+            continue
+        group, index = slot
+        task, size = tasks[group]
+        if isinstance(task, Exception):
+            slots[i] = Result(None, task)
+        else:
+            slots[i] = (task[index // size], index % size)
+    return slots
+
+
+def _collect(slots):
+    for slot in slots:
+        if isinstance(slot, Result):
+            yield slot
+            continue
+        future, index = slot
+        try:
+            yield future.result()[index]
+        except Exception as e:
+            yield Result(None, e)
+
+
+def decrypt_many(records, passphrase, workers=None, window=None, engine=AES):
+    '''
+        Decrypt an iterable of raw or armored envelopes.
+
+        Yields one Result(data, error) per record, in order: data is the
+        plaintext, or None with the exception in error when that record
+        could not be decrypted. Nothing is printed or raised for bad
+        records. workers=1 decrypts in the calling process; window is the
+        number of records grouped and submitted together (default 4 per
+        worker), at most two windows are held in memory.
+    '''
+    workers = workers or os.cpu_count() or 1
+    window = window or 4 * workers
+    if workers == 1:
+        for record in records:
+            try:
+                group, envelope = _prepare(record)
+                yield _open_group(passphrase, group, [envelope], engine)[0]
+            except Exception as e:
+                yield Result(None, e)
+        return
+    records = iter(records)
+    with ProcessPoolExecutor(workers) as pool:
+        previous = []
+        while True:
+            chunk = list(itertools.islice(records, window))
+            current = (_submit(pool, chunk, passphrase, engine, workers)
+                       if chunk else [])
+            yield from _collect(previous)
+            if not chunk:
+                break
+            previous = current
@@ -0,0 +1,132 @@
+''' FastAES – table-driven (T-table) AES engine '''
+#
+# Drop-in replacement for aesmod.aes.AES: same encrypt(data, key),
+# decrypt(data, key) and key_schedule interface and identical output,
+# but SubBytes, ShiftRows and MixColumns are folded into four 256-entry
+# lookup tables per direction and every round works on four 32-bit
+# column words.
+#
+
+import struct
+
+from aesmod import gf
+from aesmod.aes import AES
+from libcrypt import instrument
+
+
+def _ror8(word):
+    return ((word >> 8) | (word << 24)) & 0xffffffff
+
+
+def _build_tables(box, mult):
+    t0 = []
+    for x in range(256):
+        s = box[x]
+        t0.append((gf.MUL[mult[0]][s] << 24) | (gf.MUL[mult[1]][s] << 16) |
+            (gf.MUL[mult[2]][s] << 8) | gf.MUL[mult[3]][s])
+    t1 = [_ror8(w) for w in t0]
+    t2 = [_ror8(w) for w in t1]
+    t3 = [_ror8(w) for w in t2]
+    return tuple(t0), tuple(t1), tuple(t2), tuple(t3)
+
+
+TE0, TE1, TE2, TE3 = _build_tables(AES.sbox, (2, 1, 1, 3))
+TD0, TD1, TD2, TD3 = _build_tables(AES.rsbox, (14, 9, 13, 11))
+
+# final round tables: the (inverse) s-box pre-shifted into each byte lane
+SE0 = tuple(s << 24 for s in AES.sbox)
+SE1 = tuple(s << 16 for s in AES.sbox)
+SE2 = tuple(s << 8 for s in AES.sbox)
+SE3 = tuple(AES.sbox)
+SD0 = tuple(s << 24 for s in AES.rsbox)
+SD1 = tuple(s << 16 for s in AES.rsbox)
+SD2 = tuple(s << 8 for s in AES.rsbox)
+SD3 = tuple(AES.rsbox)
+
+_block = struct.Struct('>4I')
+
+
+class FastAES(AES):
+
+    @staticmethod
+    def inv_mix_word(word):
+        ''' InvMixColumns on one column word, used for the decrypt keys '''
+        return (TD0[SE3[word >> 24]] ^ TD1[SE3[(word >> 16) & 0xff]] ^
+            TD2[SE3[(word >> 8) & 0xff]] ^ TD3[SE3[word & 0xff]])
+
+    @instrument.timed('aes.expand_key')
+    def expand_round_keys(self, key):
+        '''
+            Return (n_rounds, encrypt round keys, decrypt round keys).
+
+            Round keys are flat tuples of 32-bit words, four per round.
+            The decrypt schedule is in application order and already
+            has InvMixColumns applied (equivalent inverse cipher).
+        '''
+        n_rounds = self.n_rounds(key)
+        size = 16 * (n_rounds + 1)
+        expanded = self.expand_key(key, len(key), size)
+        ek = struct.unpack('>%dI' % (size // 4), bytes(expanded))
+        dk = list(ek[4 * n_rounds:4 * n_rounds + 4])
+        for r in range(n_rounds - 1, 0, -1):
+            dk.extend(self.inv_mix_word(w) for w in ek[4 * r:4 * r + 4])
+        dk.extend(ek[0:4])
+        return n_rounds, ek, tuple(dk)
+
+    def encrypt_block(self, data, schedule):
+        n_rounds, rk, _ = schedule
+        te0, te1, te2, te3 = TE0, TE1, TE2, TE3
+        s0, s1, s2, s3 = _block.unpack(data)
+        s0 ^= rk[0]
+        s1 ^= rk[1]
+        s2 ^= rk[2]
+        s3 ^= rk[3]
+        for i in range(4, 4 * n_rounds, 4):
+            s0, s1, s2, s3 = (
+                te0[s0 >> 24] ^ te1[(s1 >> 16) & 0xff] ^
+                te2[(s2 >> 8) & 0xff] ^ te3[s3 & 0xff] ^ rk[i],
+                te0[s1 >> 24] ^ te1[(s2 >> 16) & 0xff] ^
+                te2[(s3 >> 8) & 0xff] ^ te3[s0 & 0xff] ^ rk[i + 1],
+                te0[s2 >> 24] ^ te1[(s3 >> 16) & 0xff] ^
+                te2[(s0 >> 8) & 0xff] ^ te3[s1 & 0xff] ^ rk[i + 2],
+                te0[s3 >> 24] ^ te1[(s0 >> 16) & 0xff] ^
+                te2[(s1 >> 8) & 0xff] ^ te3[s2 & 0xff] ^ rk[i + 3])
+        i = 4 * n_rounds
+        return _block.pack(
+            SE0[s0 >> 24] ^ SE1[(s1 >> 16) & 0xff] ^
+            SE2[(s2 >> 8) & 0xff] ^ SE3[s3 & 0xff] ^ rk[i],
+            SE0[s1 >> 24] ^ SE1[(s2 >> 16) & 0xff] ^
+            SE2[(s3 >> 8) & 0xff] ^ SE3[s0 & 0xff] ^ rk[i + 1],
+            SE0[s2 >> 24] ^ SE1[(s3 >> 16) & 0xff] ^
+            SE2[(s0 >> 8) & 0xff] ^ SE3[s1 & 0xff] ^ rk[i + 2],
+            SE0[s3 >> 24] ^ SE1[(s0 >> 16) & 0xff] ^
+            SE2[(s1 >> 8) & 0xff] ^ SE3[s2 & 0xff] ^ rk[i + 3])
+
+    def decrypt_block(self, data, schedule):
+        n_rounds, _, rk = schedule
+        td0, td1, td2, td3 = TD0, TD1, TD2, TD3
+        s0, s1, s2, s3 = _block.unpack(data)
+        s0 ^= rk[0]
+        s1 ^= rk[1]
+        s2 ^= rk[2]
+        s3 ^= rk[3]
+        for i in range(4, 4 * n_rounds, 4):
+            s0, s1, s2, s3 = (
+                td0[s0 >> 24] ^ td1[(s3 >> 16) & 0xff] ^
+                td2[(s2 >> 8) & 0xff] ^ td3[s1 & 0xff] ^ rk[i],
+                td0[s1 >> 24] ^ td1[(s0 >> 16) & 0xff] ^
+                td2[(s3 >> 8) & 0xff] ^ td3[s2 & 0xff] ^ rk[i + 1],
+                td0[s2 >> 24] ^ td1[(s1 >> 16) & 0xff] ^
+                td2[(s0 >> 8) & 0xff] ^ td3[s3 & 0xff] ^ rk[i + 2],
+                td0[s3 >> 24] ^ td1[(s2 >> 16) & 0xff] ^
+                td2[(s1 >> 8) & 0xff] ^ td3[s0 & 0xff] ^ rk[i + 3])
+        i = 4 * n_rounds
+        return _block.pack(
+            SD0[s0 >> 24] ^ SD1[(s3 >> 16) & 0xff] ^
+            SD2[(s2 >> 8) & 0xff] ^ SD3[s1 & 0xff] ^ rk[i],
+            SD0[s1 >> 24] ^ SD1[(s0 >> 16) & 0xff] ^
+            SD2[(s3 >> 8) & 0xff] ^ SD3[s2 & 0xff] ^ rk[i + 1],
+            SD0[s2 >> 24] ^ SD1[(s1 >> 16) & 0xff] ^
+            SD2[(s0 >> 8) & 0xff] ^ SD3[s3 & 0xff] ^ rk[i + 2],
+            SD0[s3 >> 24] ^ SD1[(s2 >> 16) & 0xff] ^
+            SD2[(s1 >> 8) & 0xff] ^ SD3[s0 & 0xff] ^ rk[i + 3])
@@ -0,0 +1,307 @@
+''' GCM – Galois/Counter Mode authenticated encryption (NIST SP 800-38D) '''
+#
+# Encryption is CTR mode over the block function of any aesmod engine
+# (32-bit counter increment, as GCM requires) and authentication is
+# GHASH over the associated data and the ciphertext, both done in the
+# same pass over the data.
+#
+# GHASH multiplies by the hash key H in GF(2^128). The product is linear
+# in the other operand, so it is tabulated per key: the 128-bit operand
+# is cut into table_bits wide chunks and table j holds every value of
+# chunk j already multiplied by H. A block then costs 16 (8-bit tables,
+# 4096 entries) or 32 (4-bit tables, 512 entries) lookups and XORs.
+#
+# An AESGCM object is bound to one key: it expands the key and builds the
+# tables once, and hands out an encryptor or decryptor per IV. H is
+# secret, so the tables live exactly as long as that object rather than
+# in a process-wide cache; gcm_encrypt() and gcm_decrypt() are one-shot
+# wrappers that build a fresh one per call.
+#
+
+import hmac
+
+from aesmod.aes import AES, AESCipher
+from libcrypt import instrument
+
+
+# x^128 + x^7 + x^2 + x + 1 in GCM's reflected bit order
+R = 0xe1 << 120
+TABLE_BITS = 8
+TAG_SIZE = 16
+# tag lengths allowed by SP 800-38D 5.2.1.2 (4 and 8 only for short data)
+TAG_SIZES = (4, 8, 12, 13, 14, 15, 16)
+
+
+def check_tag_size(tag_size):
+    if tag_size not in TAG_SIZES:
+        raise ValueError("tag_size must be one of %r" % (TAG_SIZES,))
+    return tag_size
+
+
+def gf128_mul(x, y):
+    ''' Bitwise product in GF(2^128), the reference for the tables '''
+    z, v = 0, y
+    for i in range(127, -1, -1):
+        if (x >> i) & 1:
+            z ^= v
+        v = (v >> 1) ^ R if v & 1 else v >> 1
+    return z
+
+
+def ghash_tables(h, table_bits=TABLE_BITS):
+    '''
+        Return the 128 / table_bits tables for the hash key h (an int):
+        tables[j][v] is H times the block whose chunk j (counted from the
+        most significant end) is v and every other bit is zero.
+    '''
+    if table_bits not in (4, 8):
+        raise ValueError("table_bits must be 4 or 8")
+    # powers[k] = H * x^k, the product with the block having only bit k set
+    powers, v = [], h
+    for k in range(128):
+        powers.append(v)
+        v = (v >> 1) ^ R if v & 1 else v >> 1
+    size = 1 << table_bits
+    tables = []
+    for j in range(128 // table_bits):
+        table = [0] * size
+        for bit in range(table_bits):
+            # bit `bit` of the chunk value is this bit of the block
+            p = powers[table_bits * j + table_bits - 1 - bit]
+            step = 1 << bit
+            for value in range(step):
+                table[value | step] = table[value] ^ p
+        tables.append(tuple(table))
+    return tuple(tables)
+
+
+class GHash(object):
+    '''
+        Incremental GHASH: update() takes data of any length, pad()
+        zero-fills the pending partial block (the end of a GHASH field).
+        tables, when given, are the ghash_tables(h, table_bits) already
+        built for this key.
+    '''
+
+    def __init__(self, h, table_bits=TABLE_BITS, tables=None):
+        self.tables = tables or ghash_tables(h, table_bits)
+        self.table_bits = table_bits
+        self.y = 0
+        self.pending = bytearray()
+
+    def mul_h(self, x):
+        z = 0
+        if self.table_bits == 8:
+            for table, b in zip(self.tables, x.to_bytes(16, 'big')):
+                z ^= table[b]
+        else:
+            tables = self.tables
+            for i, b in enumerate(x.to_bytes(16, 'big')):
+                z ^= tables[2 * i][b >> 4] ^ tables[2 * i + 1][b & 15]
+        return z
+
+    def update(self, data):
+        data = memoryview(data).cast('B')
+        pos = 0
+        if self.pending:
+            pos = min(len(data), 16 - len(self.pending))
+            self.pending += data[:pos]
+            if len(self.pending) < 16:
+                return
+            self.y = self.mul_h(self.y ^ int.from_bytes(self.pending, 'big'))
+            del self.pending[:]
+        y, mul_h, end = self.y, self.mul_h, len(data) - (len(data) - pos) % 16
+        for i in range(pos, end, 16):
+            y = mul_h(y ^ int.from_bytes(data[i:i + 16], 'big'))
+        self.y = y
+        self.pending += data[end:]
+
+    def pad(self):
+        if self.pending:
+            self.update(bytes(16 - len(self.pending)))
+
+
+class AESGCM(object):
+    '''
+        GCM bound to a single key.
+
+        The key schedule and the GHASH tables are computed once on
+        construction; encryptor(iv) and decryptor(iv) start a stream that
+        shares them, encrypt() and decrypt() are the one-shot forms. Keep
+        the object for as long as the key is in use, e.g.
+        AESGCM(key).encrypt(record, iv).
+    '''
+
+    def __init__(self, key, engine=AES, table_bits=TABLE_BITS):
+        self.cipher = AESCipher(key, engine)
+        self.h = int.from_bytes(self.cipher.encrypt(bytes(16)), 'big')
+        self.table_bits = table_bits
+        self.tables = ghash_tables(self.h, table_bits)
+
+    def ghash(self):
+        return GHash(self.h, self.table_bits, self.tables)
+
+    def encryptor(self, iv):
+        return GCMEncryptor(self, iv)
+
+    def decryptor(self, iv, tag_size=TAG_SIZE):
+        return GCMDecryptor(self, iv, tag_size=tag_size)
+
+    def encrypt(self, data, iv, aad=b'', tag_size=TAG_SIZE):
+        ''' Return (ciphertext, tag) '''
+        encryptor = self.encryptor(iv)
+        encryptor.update_aad(aad)
+        ciphertext = encryptor.update(data)
+        return ciphertext, encryptor.finalize(tag_size)
+
+    def decrypt(self, data, iv, tag, aad=b'', tag_size=TAG_SIZE):
+        '''
+            Return the plaintext, or raise ValueError if tag does not match
+            or is not tag_size bytes long
+        '''
+        decryptor = self.decryptor(iv, tag_size)
+        decryptor.update_aad(aad)
+        plain = decryptor.update(data)
+        decryptor.finalize(tag)
+        return plain
+
+
+class _GCMStream(object):
+    '''
+        Incremental GCM transform.
+
+        key is the raw key or an AESGCM, whose expanded key and GHASH
+        tables are then reused (engine and table_bits are ignored).
+        update_aad() feeds associated data and may only be called before
+        the first update(); update() accepts chunks of any size and
+        returns the same number of bytes.
+    '''
+
+    def __init__(self, key, iv, engine=AES, table_bits=TABLE_BITS):
+        if not iv:
+            raise ValueError("iv must not be empty")
+        gcm = key if isinstance(key, AESGCM) else AESGCM(key, engine,
+            table_bits)
+        self.cipher = gcm.cipher
+        self.ghash = ghash = gcm.ghash()
+        if len(iv) == 12:
+            j0 = bytes(iv) + b'\x00\x00\x00\x01'
+        else:
+            # J0 is the GHASH of the IV, computed with the same tables
+            ghash.update(iv)
+            ghash.pad()
+            ghash.update((8 * len(iv)).to_bytes(16, 'big'))
+            j0 = ghash.y.to_bytes(16, 'big')
+            ghash.y = 0
+        self.tag_mask = int.from_bytes(self.cipher.encrypt(j0), 'big')
+        self.prefix = j0[:12]
+        self.counter = int.from_bytes(j0[12:], 'big')
+        self.stream = b''
+        self.aad_length = 0
+        self.length = 0
+        self.started = False
+        self.finalized = False
+
+    def update_aad(self, data):
+        if self.started or self.finalized:
+            raise ValueError("associated data must come before the data")
+        self.ghash.update(data)
+        self.aad_length += len(data)
+
+    def keystream(self, n):
+        ''' The next n bytes of keystream '''
+        stream = self.stream
+        if len(stream) < n:
+            n_blocks = (n - len(stream) + 15) // 16
+            instrument.count('aes.blocks', n_blocks)
+            encrypt, prefix, counter = (self.cipher.encrypt, self.prefix,
+                self.counter)
+            blocks = [stream]
+            for i in range(1, n_blocks + 1):
+                blocks.append(encrypt(prefix +
+                    ((counter + i) & 0xffffffff).to_bytes(4, 'big')))
+            self.counter = (counter + n_blocks) & 0xffffffff
+            stream = b''.join(blocks)
+        self.stream = stream[n:]
+        return stream[:n]
+
+    def start(self):
+        ''' End the associated data (GHASH pads it to a whole block) '''
+        if self.finalized:
+            raise ValueError("stream already finalized")
+        if not self.started:
+            self.ghash.pad()
+            self.started = True
+
+    def crypt(self, data):
+        n = len(data)
+        self.length += n
+        if not n:
+            return b''
+        return (int.from_bytes(data, 'big') ^
+            int.from_bytes(self.keystream(n), 'big')).to_bytes(n, 'big')
+
+    def tag(self):
+        self.start()
+        self.finalized = True
+        self.ghash.pad()
+        self.ghash.update(((8 * self.aad_length) << 64 | 8 * self.length)
+            .to_bytes(16, 'big'))
+        return (self.ghash.y ^ self.tag_mask).to_bytes(16, 'big')
+
+
+class GCMEncryptor(_GCMStream):
+
+    def update(self, data):
+        self.start()
+        ciphertext = self.crypt(data)
+        self.ghash.update(ciphertext)
+        return ciphertext
+
+    def finalize(self, tag_size=TAG_SIZE):
+        ''' Return the authentication tag (its first tag_size bytes) '''
+        return self.tag()[:check_tag_size(tag_size)]
+
+
+class GCMDecryptor(_GCMStream):
+    '''
+        update() returns plaintext before it is authenticated: it must
+        not be used until finalize(tag) has returned.
+
+        The expected tag length is fixed up front by tag_size, never taken
+        from the tag itself: a truncated tag is rejected rather than
+        checked against a weaker forgery bound.
+    '''
+
+    def __init__(self, key, iv, engine=AES, table_bits=TABLE_BITS,
+            tag_size=TAG_SIZE):
+        self.tag_size = check_tag_size(tag_size)
+        super().__init__(key, iv, engine, table_bits)
+
+    def update(self, data):
+        self.start()
+        self.ghash.update(data)
+        return self.crypt(data)
+
+    def finalize(self, tag):
+        ''' Raise ValueError unless tag authenticates the stream '''
+        if len(tag) != self.tag_size:
+            raise ValueError("tag must be %d bytes long" % self.tag_size)
+        if not hmac.compare_digest(self.tag()[:self.tag_size], tag):
+            raise ValueError("mac mismatch")
+
+
+def gcm_encrypt(data, key, iv, aad=b'', engine=AES, tag_size=TAG_SIZE,
+        table_bits=TABLE_BITS):
+    ''' Return (ciphertext, tag) '''
+    return AESGCM(key, engine, table_bits).encrypt(data, iv, aad, tag_size)
+
+
+def gcm_decrypt(data, key, iv, tag, aad=b'', engine=AES, tag_size=TAG_SIZE,
+        table_bits=TABLE_BITS):
+    '''
+        Return the plaintext, or raise ValueError if tag does not match or
+        is not tag_size bytes long
+    '''
+    return AESGCM(key, engine, table_bits).decrypt(data, iv, tag, aad,
+        tag_size)
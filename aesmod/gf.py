@@ -0,0 +1,79 @@
+''' GF – arithmetic in GF(2^8) with the AES polynomial '''
+#
+# Elements are ints 0-255, addition is XOR and multiplication is modulo
+# x^8 + x^4 + x^3 + x + 1 (0x11b). Everything is tabulated once at
+# import:
+#
+#   EXP, LOG   antilog/log tables for the generator 3, so a general
+#              product is EXP[LOG[a] + LOG[b]] (EXP is doubled to 510
+#              entries to skip the modulo)
+#   MUL[c]     the 256-byte multiply-by-c table for every constant c,
+#              so MUL[c][x] == mul(x, c); the MixColumns constants are
+#              also exported by name (MUL2, MUL3, MUL9, ...)
+#
+
+POLY = 0x11b
+GENERATOR = 3
+
+
+def xtime(a):
+    ''' a * x (i.e. a * 2) '''
+    a <<= 1
+    if a & 0x100:
+        a ^= POLY
+    return a
+
+
+def mul_slow(a, b):
+    ''' Shift-and-add product, only used to build the tables '''
+    p = 0
+    while b:
+        if b & 1:
+            p ^= a
+        a = xtime(a)
+        b >>= 1
+    return p
+
+
+def _log_tables():
+    exp, log = [0] * 510, [0] * 256
+    x = 1
+    for i in range(255):
+        exp[i] = exp[i + 255] = x
+        log[x] = i
+        x = mul_slow(x, GENERATOR)
+    return tuple(exp), tuple(log)
+
+
+EXP, LOG = _log_tables()
+
+
+def mul(a, b):
+    if a == 0 or b == 0:
+        return 0
+    return EXP[LOG[a] + LOG[b]]
+
+
+def inverse(a):
+    ''' Multiplicative inverse (0 maps to 0, as in the AES s-box) '''
+    if a == 0:
+        return 0
+    return EXP[255 - LOG[a]]
+
+
+def _mul_table(c):
+    if c == 0:
+        return bytes(256)
+    log_c = LOG[c]
+    return bytes([0]) + bytes(EXP[LOG[x] + log_c] for x in range(1, 256))
+
+
+MUL = tuple(_mul_table(c) for c in range(256))
+
+MUL1 = MUL[1]
+MUL2 = MUL[2]
+MUL3 = MUL[3]
+MUL9 = MUL[9]
+MUL11 = MUL[11]
+MUL13 = MUL[13]
+MUL14 = MUL[14]
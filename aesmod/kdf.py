@@ -0,0 +1,181 @@
+''' KDF – passphrase stretching backends with a derived-key cache '''
+#
+# Every backend takes (passphrase, iterations, salt) and returns a 32 byte
+# key. The backend id is stored in the aesmod.aes envelope header, so old
+# envelopes keep using the original SHA-256 chain while new ones can opt
+# into pbkdf2_hmac or scrypt, which run in C.
+#
+# The header is read before the MAC can be checked, so its kdf id and work
+# factor are untrusted: check() refuses unknown backends and work factors
+# above limits[kdf]. Unless set by the caller, a limit is calibrated on
+# first use to about MAX_SECONDS of work on this machine (scrypt n is also
+# capped by MAX_SCRYPT_N, i.e. its memory).
+#
+
+import collections
+import hashlib
+import math
+import threading
+import time
+
+from libcrypt import instrument
+
+
+SHA256_CHAIN = 0
+PBKDF2_SHA256 = 1
+SCRYPT = 2
+
+KEY_SIZE = 32
+
+MAX_SECONDS = 4.0
+MAX_SCRYPT_N = 1 << 18              # 256 MiB with r = 8
+CALIBRATION_TIME = 0.05
+limits = {}                         # kdf id -> highest accepted work factor
+
+
+def sha256_chain(passphrase, iterations, salt):
+    ''' The original aes.stretch construction '''
+    suffix = passphrase.encode() + salt
+    digest = hashlib.sha256(suffix).digest()
+    sha256 = hashlib.sha256
+    for i in range(iterations):
+        digest = sha256(digest + suffix).digest()
+    return digest
+
+
+def pbkdf2_sha256(passphrase, iterations, salt):
+    return hashlib.pbkdf2_hmac('sha256', passphrase.encode(), salt,
+        iterations, KEY_SIZE)
+
+
+def scrypt(passphrase, iterations, salt):
+    ''' iterations is the scrypt cost parameter n (a power of 2) '''
+    return hashlib.scrypt(passphrase.encode(), salt=salt, n=iterations, r=8,
+        p=1, maxmem=2048 * (iterations + 2) + (1 << 20), dklen=KEY_SIZE)
+
+
+BACKENDS = {
+    SHA256_CHAIN: sha256_chain,
+    PBKDF2_SHA256: pbkdf2_sha256,
+    SCRYPT: scrypt,
+}
+
+
+def max_iterations(kdf):
+    ''' limits[kdf], calibrated to MAX_SECONDS on first use if unset '''
+    limit = limits.get(kdf)
+    if limit is None:
+        if kdf == SCRYPT:
+            # scrypt time is linear in n: time a short run and scale it
+            n = calibrate(CALIBRATION_TIME, SCRYPT, limit=MAX_SCRYPT_N)
+            scale = 1 << max(0, int(math.log2(MAX_SECONDS / CALIBRATION_TIME)))
+            limit = min(MAX_SCRYPT_N, n * scale)
+        else:
+            limit = calibrate(MAX_SECONDS, kdf)
+        limits[kdf] = limit
+    return limit
+
+
+def check(kdf, iterations):
+    '''
+        Raise ValueError unless kdf is a known backend and iterations a
+        work factor it accepts, within max_iterations(kdf).
+    '''
+    if kdf not in BACKENDS:
+        raise ValueError("unknown kdf %r" % (kdf,))
+    if kdf == SCRYPT and (iterations < 2 or iterations & (iterations - 1)):
+        raise ValueError("scrypt n must be a power of 2")
+    if iterations > max_iterations(kdf):
+        raise ValueError("%d iterations exceed the limit of %d for kdf %r" %
+            (iterations, max_iterations(kdf), kdf))
+
+
+class KeyCache(object):
+    '''
+        Bounded LRU of derived keys whose entries expire after ttl seconds.
+
+        Entries are keyed on a hash of the passphrase, never on the
+        passphrase itself.
+    '''
+
+    def __init__(self, maxsize=256, ttl=300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, ident):
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(ident)
+            if entry is None or entry[0] < now:
+                if entry is not None:
+                    del self.entries[ident]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(ident)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, ident, key):
+        with self.lock:
+            self.entries[ident] = (time.monotonic() + self.ttl, key)
+            self.entries.move_to_end(ident)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = self.misses = 0
+
+
+cache = KeyCache()
+instrument.gauge('kdf.cache', lambda: {'hits': cache.hits, 'misses': cache.misses,
+                                       'size': len(cache.entries)})
+
+
+def derive(passphrase, iterations, salt, kdf=SHA256_CHAIN, cache=cache):
+    '''
+        Derive a key with the given backend, consulting cache first.
+
+        Pass cache=None to bypass it, e.g. when the salt is fresh.
+    '''
+    if kdf not in BACKENDS:
+        raise ValueError("unknown kdf %r" % (kdf,))
+    salt = bytes(salt)
+    ident = None
+    if cache is not None:
+        ident = (kdf, hashlib.sha256(passphrase.encode()).digest(), salt,
+            iterations)
+        key = cache.get(ident)
+        if key is not None:
+            return key
+    with instrument.timer('kdf.derive'):
+        key = BACKENDS[kdf](passphrase, iterations, salt)
+    if cache is not None:
+        cache.put(ident, key)
+    return key
+
+
+def calibrate(target, kdf=PBKDF2_SHA256, salt=bytes(32), limit=1 << 30):
+    '''
+        Return an iteration count whose derivation takes about target
+        seconds on this machine. For scrypt this is the largest power of
+        two that stays within target.
+    '''
+    backend = BACKENDS[kdf]
+    iterations = 2 if kdf == SCRYPT else 1024
+    while True:
+        start = time.perf_counter()
+        backend('calibration', iterations, salt)
+        elapsed = time.perf_counter() - start
+        if kdf == SCRYPT:
+            if elapsed > target:
+                return max(2, iterations // 2)
+        elif elapsed >= min(target, 0.05):
+            return max(1, min(limit, int(iterations * target / elapsed)))
+        if iterations >= limit:
+            return limit
+        iterations *= 2
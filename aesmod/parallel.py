@@ -0,0 +1,99 @@
+''' Multi-process bulk engine for the block-parallel AES modes '''
+#
+# ECB blocks, CTR keystream blocks and CBC *decryption* blocks are
+# independent of each other, so large inputs are split into contiguous
+# block ranges that are processed by a ProcessPoolExecutor and joined
+# back in order. Inputs below the threshold (or with a single worker)
+# are processed in the calling process with the same range functions.
+#
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from aesmod.aes import (AES, AESModeOfOperationCBC, AESModeOfOperationECB,
+    AESModeOfOperationCTR)
+
+
+# inputs shorter than this many bytes are not worth shipping to workers
+PARALLEL_THRESHOLD = 1 << 20
+
+
+def split(length, workers):
+    ''' Split length bytes into at most workers block aligned ranges '''
+    n_blocks = (length + 15) // 16
+    per_worker = max(1, (n_blocks + workers - 1) // workers)
+    return [(i * 16, min(length, (i + per_worker) * 16))
+        for i in range(0, n_blocks, per_worker)]
+
+
+def _ecb_encrypt_range(engine, key, data):
+    return AESModeOfOperationECB(engine).encrypt_blocks(data, key)
+
+
+def _ecb_decrypt_range(engine, key, data):
+    return AESModeOfOperationECB(engine).decrypt_blocks(data, key)
+
+
+def _ctr_range(engine, key, counter, offset, data):
+    return AESModeOfOperationCTR(counter, engine).crypt(data, key, offset)
+
+
+def _cbc_decrypt_range(engine, key, prev, data):
+    return AESModeOfOperationCBC(prev, engine).decrypt_blocks(data, key)
+
+
+def run(worker, args, length, workers=None, threshold=PARALLEL_THRESHOLD):
+    '''
+        Apply worker to every block range of an input of length bytes.
+
+        args(start, end) returns the positional arguments for the range,
+        the worker returns the processed bytes of that range.
+    '''
+    workers = workers or os.cpu_count() or 1
+    ranges = split(length, workers)
+    if len(ranges) < 2 or length < threshold:
+        return worker(*args(0, length))
+    with ProcessPoolExecutor(len(ranges)) as pool:
+        futures = [pool.submit(worker, *args(start, end))
+            for start, end in ranges]
+        return b''.join(future.result() for future in futures)
+
+
+def ecb_encrypt(data, key, engine=AES, workers=None,
+        threshold=PARALLEL_THRESHOLD):
+    data = AESModeOfOperationCBC.pad(data)
+    return run(_ecb_encrypt_range,
+        lambda start, end: (engine, key, data[start:end]),
+        len(data), workers, threshold)
+
+
+def ecb_decrypt(data, key, engine=AES, workers=None,
+        threshold=PARALLEL_THRESHOLD):
+    plain = run(_ecb_decrypt_range,
+        lambda start, end: (engine, key, data[start:end]),
+        len(data), workers, threshold)
+    AESModeOfOperationCBC.check_padding(plain)
+    return AESModeOfOperationCBC.unpad(plain)
+
+
+def ctr_encrypt(data, key, counter, engine=AES, workers=None,
+        threshold=PARALLEL_THRESHOLD):
+    return run(_ctr_range,
+        lambda start, end: (engine, key, counter, start // 16,
+            data[start:end]),
+        len(data), workers, threshold)
+
+
+ctr_decrypt = ctr_encrypt
+
+
+def cbc_decrypt(data, key, iv, engine=AES, workers=None,
+        threshold=PARALLEL_THRESHOLD):
+    if len(data) % 16:
+        raise ValueError("padding error")
+    plain = run(_cbc_decrypt_range,
+        lambda start, end: (engine, key,
+            iv if start == 0 else data[start - 16:start], data[start:end]),
+        len(data), workers, threshold)
+    AESModeOfOperationCBC.check_padding(plain)
+    return AESModeOfOperationCBC.unpad(plain)
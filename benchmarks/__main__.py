@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+''' Benchmark command line
+
+    python -m benchmarks run [-k MATCH] [-o results.json] [--quick]
+    python -m benchmarks compare baseline.json current.json [-t 0.1]
+    python -m benchmarks list [-k MATCH]
+    python -m benchmarks check
+
+    compare exits with status 1 when any benchmark regressed.
+'''
+
+import argparse
+import sys
+
+from benchmarks import runner, suites, vectors
+
+
+def cmd_run(args):
+    min_time = runner.MIN_TIME / 4 if args.quick else runner.MIN_TIME
+    repeat = 2 if args.quick else runner.REPEAT
+    document = runner.run(args.match, min_time, repeat, verbose=True)
+    if args.output:
+        runner.save(document, args.output)
+    return 0
+
+
+def cmd_compare(args):
+    rows = runner.compare(runner.load(args.baseline), runner.load(args.current),
+                          args.threshold)
+    for name, before, after, ratio, regressed in rows:
+        print('{:<48} {:>16,.1f} {:>16,.1f} {:>7.2f}x{}'.format(
+            name, before, after, ratio, '  REGRESSION' if regressed else ''))
+    return 1 if any(row[4] for row in rows) else 0
+
+
+def cmd_list(args):
+    for name, _, _, unit in suites.benchmarks(args.match):
+        print('{:<48} {}/s'.format(name, unit))
+    return 0
+
+
+def cmd_check(args):
+    vectors.check()
+    print('ok')
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    p = commands.add_parser('run', help='time the benchmarks')
+    p.add_argument('-k', '--match', help='only names containing MATCH')
+    p.add_argument('-o', '--output', help='write the JSON results here')
+    p.add_argument('--quick', action='store_true', help='shorter, noisier timings')
+    p.set_defaults(func=cmd_run)
+
+    p = commands.add_parser('compare', help='compare two JSON results')
+    p.add_argument('baseline')
+    p.add_argument('current')
+    p.add_argument('-t', '--threshold', type=float, default=runner.THRESHOLD,
+                   help='tolerated relative slowdown (default %(default)s)')
+    p.set_defaults(func=cmd_compare)
+
+    p = commands.add_parser('list', help='list the benchmark names')
+    p.add_argument('-k', '--match', help='only names containing MATCH')
+    p.set_defaults(func=cmd_list)
+
+    p = commands.add_parser('check', help='only check the known-answer vectors')
+    p.set_defaults(func=cmd_check)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    # execute only if run as a script
+    sys.exit(main())
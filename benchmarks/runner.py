@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+''' Timing, JSON results and comparison between runs
+
+    Results file:
+        {"meta": {"python": ..., "platform": ..., "seed": ..., "time": ...},
+         "results": {name: {"rate": units per second, "unit": unit}}}
+
+    A benchmark regresses when its rate drops by more than the threshold
+    (a fraction, 0.1 = 10%) relative to the baseline run.
+'''
+
+import json
+import platform
+import time
+
+from benchmarks import suites, vectors
+
+MIN_TIME = 0.2
+REPEAT = 5
+THRESHOLD = 0.1
+
+
+def measure(func, min_time=MIN_TIME, repeat=REPEAT):
+    '''
+        Calls func in batches sized so that one batch takes at least
+        min_time, and keeps the fastest of `repeat` batches.
+        return
+            calls per second
+    '''
+    timer = time.perf_counter
+    number = 1
+    while True:
+        start = timer()
+        for _ in range(number):
+            func()
+        best = timer() - start
+        if best >= min_time:
+            break
+        # aim a little above min_time to avoid a further doubling step
+        number = max(number * 2, int(number * 1.2 * min_time / max(best, 1e-9)))
+    for _ in range(repeat - 1):
+        start = timer()
+        for _ in range(number):
+            func()
+        best = min(best, timer() - start)
+    return number / best
+
+
+def run(match=None, min_time=MIN_TIME, repeat=REPEAT, verbose=False):
+    '''
+        Checks the known-answer vectors, then times every benchmark whose
+        name contains match.
+        return
+            the results document (see module docstring)
+    '''
+    vectors.check()
+    results = {}
+    for name, func, units, unit in suites.benchmarks(match):
+        rate = units * measure(func, min_time, repeat)
+        results[name] = {'rate': rate, 'unit': unit}
+        if verbose:
+            print('{:<48} {:>16,.1f} {}/s'.format(name, rate, unit), flush=True)
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'seed': suites.SEED,
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': results,
+    }
+
+
+def save(document, path):
+    with open(path, 'w') as f:
+        json.dump(document, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(baseline, current, threshold=THRESHOLD):
+    '''
+        param
+            baseline, current: results documents
+            threshold (optional): tolerated relative slowdown
+        return
+            [(name, baseline rate, current rate, ratio, regressed), ...]
+            for the benchmarks present in both, ratio = current / baseline
+    '''
+    old, new = baseline['results'], current['results']
+    rows = []
+    for name in sorted(set(old) & set(new)):
+        before, after = old[name]['rate'], new[name]['rate']
+        ratio = after / before if before else float('inf')
+        rows.append((name, before, after, ratio, ratio < 1 - threshold))
+    return rows
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+''' The benchmarks
+
+    Every suite is a generator yielding (name, func, units, unit): func()
+    is the timed call and processes `units` units (blocks, bytes, keys,
+    conversions...), so a result is a rate in unit/s where higher is
+    better. Suites build their inputs from a random.Random(SEED), so every
+    run times the same data. Names are slash separated, the CLI filters
+    on them.
+'''
+
+import random
+
+from aesmod import kdf
+from aesmod.aes import AES, CBCEncryptor, CBCDecryptor
+from aesmod.fastaes import FastAES
+from aesmod.gcm import AESGCM, GCMEncryptor, GHash
+from libcrypt import codec, lcrypt
+from libcrypt.crack import crack_single_byte_xor
+from libcrypt.freqchars import freqchars
+from libcrypt.xor import repeating_key_xor, single_byte_xor
+
+SEED = 1337
+
+ENGINES = (AES, FastAES)
+KEY_SIZES = (16, 24, 32)
+CBC_SIZES = (1 << 10, 1 << 14, 1 << 16)
+GCM_RECORD_SIZE = 256
+KDF_ITERATIONS = (1 << 10, 1 << 13, 1 << 16)
+CONVERT_SIZE = 64
+CRACK_SIZE = 64
+
+SUITES = []
+
+
+def suite(func):
+    SUITES.append(func)
+    return func
+
+
+@suite
+def aes_block(rng):
+    plain = rng.randbytes(16)
+    for engine in ENGINES:
+        aes = engine()
+        for size in KEY_SIZES:
+            schedule = aes.key_schedule(rng.randbytes(size))
+            name = 'aes/block/{}/{}'.format(engine.__name__, 8 * size)
+            yield (name + '/encrypt', lambda aes=aes, s=schedule: aes.encrypt_block(plain, s),
+                   1, 'block')
+            yield (name + '/decrypt', lambda aes=aes, s=schedule: aes.decrypt_block(plain, s),
+                   1, 'block')
+    yield ('aes/galois_multiplication',
+           lambda g=AES().galois_multiplication: g(0x57, 0x83), 1, 'op')
+
+
+@suite
+def aes_cbc(rng):
+    key, iv = rng.randbytes(16), rng.randbytes(16)
+    for engine in ENGINES:
+        for size in CBC_SIZES:
+            data = rng.randbytes(size)
+            name = 'aes/cbc/{}/{}'.format(engine.__name__, size)
+            yield (name + '/encrypt',
+                   lambda e=engine, d=data: CBCEncryptor(key, iv, e).update(d), size, 'B')
+            yield (name + '/decrypt',
+                   lambda e=engine, d=data + bytes(16): CBCDecryptor(key, iv, e).update(d),
+                   size, 'B')
+
+
+@suite
+def aes_gcm(rng):
+    key, iv = rng.randbytes(16), rng.randbytes(12)
+    for engine in ENGINES:
+        for size in CBC_SIZES:
+            data = rng.randbytes(size)
+            yield ('aes/gcm/{}/{}/encrypt'.format(engine.__name__, size),
+                   lambda e=engine, d=data: GCMEncryptor(key, iv, e).update(d), size, 'B')
+        # short records under one key object: no per-record key setup
+        record = rng.randbytes(GCM_RECORD_SIZE)
+        yield ('aes/gcm/{}/record{}'.format(engine.__name__, GCM_RECORD_SIZE),
+               lambda g=AESGCM(key, engine): g.encrypt(record, iv), GCM_RECORD_SIZE, 'B')
+    data, h = rng.randbytes(1 << 14), rng.getrandbits(128)
+    for bits in (4, 8):
+        yield ('aes/ghash/{}'.format(bits),
+               lambda g=GHash(h, bits): g.update(data), len(data), 'B')
+
+
+@suite
+def kdf_latency(rng):
+    salt = rng.randbytes(32)
+    for name, backend in (('sha256_chain', kdf.sha256_chain),
+                          ('pbkdf2_sha256', kdf.pbkdf2_sha256)):
+        for iterations in KDF_ITERATIONS:
+            yield ('kdf/{}/{}'.format(name, iterations),
+                   lambda b=backend, n=iterations: b('passphrase', n, salt), 1, 'key')
+
+
+@suite
+def convert(rng):
+    data = rng.randbytes(CONVERT_SIZE)
+    other = rng.randbytes(CONVERT_SIZE)
+    hexed, b64 = data.hex(), codec.to_base64(data)
+    text = bytes(b % 95 + 32 for b in data).decode('ascii')
+    bits = codec.to_bits(data)
+    for name, func in (
+            ('lcrypt/hex2Base64', lambda: lcrypt.hex2Base64(hexed)),
+            ('lcrypt/hex2Dec', lambda: lcrypt.hex2Dec(hexed)),
+            ('lcrypt/base642Hex', lambda: lcrypt.base642Hex(b64)),
+            ('lcrypt/str2Hex', lambda: lcrypt.str2Hex(text)),
+            ('lcrypt/str2Base64', lambda: lcrypt.str2Base64(text)),
+            ('lcrypt/hexxor', lambda: lcrypt.hexxor(hexed, other.hex())),
+            ('lcrypt/isHex', lambda: lcrypt.isHex(hexed)),
+            ('lcrypt/isBase64', lambda: lcrypt.isBase64(b64)),
+            ('codec/to_hex', lambda: codec.to_hex(data)),
+            ('codec/from_hex', lambda: codec.from_hex(hexed)),
+            ('codec/to_base64', lambda: codec.to_base64(data)),
+            ('codec/from_base64', lambda: codec.from_base64(b64)),
+            ('codec/to_bits', lambda: codec.to_bits(data)),
+            ('codec/from_bits', lambda: codec.from_bits(bits))):
+        yield 'convert/' + name, func, 1, 'op'
+
+
+@suite
+def xor(rng):
+    data, key = rng.randbytes(1 << 16), rng.randbytes(16)
+    yield 'xor/single_byte', lambda: single_byte_xor(data, 0x5a), len(data), 'B'
+    yield 'xor/repeating_key', lambda: repeating_key_xor(data, key), len(data), 'B'
+
+
+@suite
+def crack(rng):
+    words = b'the quick brown fox jumps over a lazy dog and then some '.split()
+    plain = b' '.join(rng.choice(words) for _ in range(CRACK_SIZE))[:CRACK_SIZE]
+    ciphertext = single_byte_xor(plain, rng.randrange(256))
+    yield ('crack/single_byte_xor', lambda: crack_single_byte_xor(ciphertext, top=1),
+           1, 'crack')
+    yield 'freqchars', freqchars, 1, 'op'
+
+
+def benchmarks(match=None):
+    '''
+        param
+            match (optional): only yield names containing this substring
+        return
+            generator of (name, func, units, unit); every suite gets its
+            own random.Random(SEED)
+    '''
+    for s in SUITES:
+        for name, func, units, unit in s(random.Random(SEED)):
+            if match is None or match in name:
+                yield name, func, units, unit
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+''' Known-answer vectors checked before anything is timed
+
+    A benchmark of a broken implementation is meaningless, so every run
+    first checks the code under test against published vectors:
+        FIPS-197 appendix C     AES-128/192/256 single block
+        SP 800-38A F.2.1        AES-128 CBC, four blocks
+        GCM spec test cases 1-6 AES-128 GCM: empty, one block, no associated
+                                data, associated data, 64 and 480-bit IVs;
+                                with 8-bit and 4-bit GHASH tables
+        RFC 7914 section 11     PBKDF2-HMAC-SHA256 (first 32 bytes)
+        cryptopals set 1        hex to base64, fixed XOR, single-byte XOR
+'''
+
+from aesmod import kdf
+from aesmod.aes import AES, CBCEncryptor, CBCDecryptor
+from aesmod.fastaes import FastAES
+from aesmod.gcm import gcm_encrypt, gcm_decrypt
+from libcrypt import codec, lcrypt
+from libcrypt.crack import crack_single_byte_xor
+
+ENGINES = (AES, FastAES)
+
+FIPS197 = (
+    # (key, plaintext, ciphertext)
+    ('000102030405060708090a0b0c0d0e0f',
+     '00112233445566778899aabbccddeeff',
+     '69c4e0d86a7b0430d8cdb78070b4c55a'),
+    ('000102030405060708090a0b0c0d0e0f1011121314151617',
+     '00112233445566778899aabbccddeeff',
+     'dda97ca4864cdfe06eaf70a0ec0d7191'),
+    ('000102030405060708090a0b0c0d0e0f101112131415161718191a1b1c1d1e1f',
+     '00112233445566778899aabbccddeeff',
+     '8ea2b7ca516745bfeafc49904b496089'),
+)
+
+CBC = (
+    # (key, iv, plaintext, ciphertext)
+    ('2b7e151628aed2a6abf7158809cf4f3c',
+     '000102030405060708090a0b0c0d0e0f',
+     '6bc1bee22e409f96e93d7e117393172aae2d8a571e03ac9c9eb76fac45af8e51'
+     '30c81c46a35ce411e5fbc1191a0a52eff69f2445df4f9b17ad2b417be66c3710',
+     '7649abac8119b246cee98e9b12e9197d5086cb9b507219ee95db113a917678b2'
+     '73bed6b8e3c1743b7116e69e222295163ff1caa1681fac09120eca307586e1a7'),
+)
+
+_GCM_KEY = 'feffe9928665731c6d6a8f9467308308'
+_GCM_AAD = 'feedfacedeadbeeffeedfacedeadbeefabaddad2'
+_GCM_PLAIN = ('d9313225f88406e5a55909c5aff5269a86a7a9531534f7da2e4c303d8a318a72'
+              '1c3c0c95956809532fcf0e2449a6b525b16aedf5aa0de657ba637b39')
+
+GCM = (
+    # (key, iv, associated data, plaintext, ciphertext, tag)
+    ('00000000000000000000000000000000',
+     '000000000000000000000000',
+     '', '', '',
+     '58e2fccefa7e3061367f1d57a4e7455a'),
+    ('00000000000000000000000000000000',
+     '000000000000000000000000',
+     '',
+     '00000000000000000000000000000000',
+     '0388dace60b6a392f328c2b971b2fe78',
+     'ab6e47d42cec13bdf53a67b21257bddf'),
+    (_GCM_KEY,
+     'cafebabefacedbaddecaf888',
+     '',
+     _GCM_PLAIN + '1aafd255',
+     '42831ec2217774244b7221b784d0d49ce3aa212f2c02a4e035c17e2329aca12e'
+     '21d514b25466931c7d8f6a5aac84aa051ba30b396a0aac973d58e091473f5985',
+     '4d5c2af327cd64a62cf35abd2ba6fab4'),
+    (_GCM_KEY,
+     'cafebabefacedbaddecaf888',
+     _GCM_AAD,
+     _GCM_PLAIN,
+     '42831ec2217774244b7221b784d0d49ce3aa212f2c02a4e035c17e2329aca12e'
+     '21d514b25466931c7d8f6a5aac84aa051ba30b396a0aac973d58e091',
+     '5bc94fbc3221a5db94fae95ae7121a47'),
+    (_GCM_KEY,
+     'cafebabefacedbad',
+     _GCM_AAD,
+     _GCM_PLAIN,
+     '61353b4c2806934a777ff51fa22a4755699b2a714fcdc6f83766e5f97b6c7423'
+     '73806900e49f24b22b097544d4896b424989b5e1ebac0f07c23f4598',
+     '3612d2e79e3b0785561be14aaca2fccb'),
+    (_GCM_KEY,
+     '9313225df88406e555909c5aff5269aa6a7a9538534f7da1e4c303d2a318a728'
+     'c3c0c95156809539fcf0e2429a6b525416aedbf5a0de6a57a637b39b',
+     _GCM_AAD,
+     _GCM_PLAIN,
+     '8ce24998625615b603a033aca13fb894be9112a5c3a211a8ba262a3cca7e2ca7'
+     '01e4a9a4fba43c90ccdcb281d48c7c6fd62875d2aca417034c34aee5',
+     '619cc5aefffe0bfa462af43c1699d050'),
+)
+GCM_TABLE_BITS = (8, 4)
+
+PBKDF2 = (
+    # (passphrase, salt, iterations, key)
+    ('passwd', b'salt', 1,
+     '55ac046e56e3089fec1691c22544b605f94185216dde0465e68b9d57c20dacbc'),
+)
+
+HEX2BASE64 = (
+    '49276d206b696c6c696e6720796f757220627261696e206c696b65206120706f69736f6e6f7573206d757368726f6f6d',
+    'SSdtIGtpbGxpbmcgeW91ciBicmFpbiBsaWtlIGEgcG9pc29ub3VzIG11c2hyb29t',
+)
+
+FIXED_XOR = (
+    '1c0111001f010100061a024b53535009181c',
+    '686974207468652062756c6c277320657965',
+    '746865206b696420646f6e277420706c6179',
+)
+
+SINGLE_BYTE_XOR = (
+    '1b37373331363f78151b7f2b783431333d78397828372d363c78373e783a393b3736',
+    0x58,
+    b"Cooking MC's like a pound of bacon",
+)
+
+
+def _expect(name, got, expected):
+    if got != expected:
+        raise AssertionError('{}: got {!r}, expected {!r}'.format(name, got, expected))
+
+
+def check():
+    ''' raise AssertionError naming the first vector that fails '''
+    for engine in ENGINES:
+        aes = engine()
+        for key, plain, cipher in FIPS197:
+            key, plain, cipher = map(bytes.fromhex, (key, plain, cipher))
+            name = '{} AES-{}'.format(engine.__name__, 8 * len(key))
+            schedule = aes.key_schedule(key)
+            _expect(name + ' encrypt', bytes(aes.encrypt_block(plain, schedule)), cipher)
+            _expect(name + ' decrypt', bytes(aes.decrypt_block(cipher, schedule)), plain)
+        for key, iv, plain, cipher in CBC:
+            key, iv, plain, cipher = map(bytes.fromhex, (key, iv, plain, cipher))
+            name = '{} CBC'.format(engine.__name__)
+            _expect(name + ' encrypt', CBCEncryptor(key, iv, engine).update(plain), cipher)
+            _expect(name + ' decrypt', CBCDecryptor(key, iv, engine).update(cipher + bytes(16)), plain)
+        for case, vector in enumerate(GCM, 1):
+            key, iv, aad, plain, cipher, tag = map(bytes.fromhex, vector)
+            for bits in GCM_TABLE_BITS:
+                name = '{} GCM case {} ({}-bit tables)'.format(engine.__name__, case, bits)
+                _expect(name + ' encrypt',
+                        gcm_encrypt(plain, key, iv, aad, engine, table_bits=bits), (cipher, tag))
+                _expect(name + ' decrypt',
+                        gcm_decrypt(cipher, key, iv, tag, aad, engine, table_bits=bits), plain)
+
+    for passphrase, salt, iterations, key in PBKDF2:
+        _expect('PBKDF2-HMAC-SHA256', kdf.pbkdf2_sha256(passphrase, iterations, salt),
+                bytes.fromhex(key))
+
+    _expect('hex2Base64', lcrypt.hex2Base64(HEX2BASE64[0]), HEX2BASE64[1])
+    _expect('codec base64', codec.to_base64(codec.from_hex(HEX2BASE64[0])),
+            HEX2BASE64[1].encode('ascii'))
+    _expect('hexxor', lcrypt.hexxor(FIXED_XOR[0], FIXED_XOR[1]), bytes.fromhex(FIXED_XOR[2]))
+    ciphertext, key, plaintext = SINGLE_BYTE_XOR
+    _expect('single-byte XOR', crack_single_byte_xor(bytes.fromhex(ciphertext), top=1)[0][::2],
+            (key, plaintext))
+
+
+if __name__ == "__main__":
+    # execute only if run as a script
+    check()
+    print('ok')
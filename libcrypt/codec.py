@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+''' Conversions between raw bytes and their text representations
+
+    Every encoder takes a buffer (bytes, bytearray, memoryview) and returns
+    the ASCII representation as bytes; every decoder takes that
+    representation (bytes, buffer or ASCII str) and returns raw bytes.
+    Nothing goes through a decoded Python str: hex and base64 are done by
+    binascii, bits and decimal by int.from_bytes()/int.to_bytes(), octal
+    with 256-entry tables. All of them accept out= to write the result
+    into an existing writable buffer instead.
+
+        hex     b'4927'             2 digits per byte
+        base64  b'SSc='             standard alphabet, no newline
+        bits    b'0100100100100111' 8 digits per byte
+        oct     b'111047'           3 digits per byte
+        dec     18727               big-endian unsigned integer
+'''
+
+import binascii
+
+# per-byte representations, indexed by byte value
+HEX_TABLE = tuple('{:02x}'.format(b).encode('ascii') for b in range(256))
+BITS_TABLE = tuple('{:08b}'.format(b).encode('ascii') for b in range(256))
+OCT_TABLE = tuple('{:03o}'.format(b).encode('ascii') for b in range(256))
+
+# and back, for the fixed-width octal digits
+_OCT_VALUES = dict((o, b) for b, o in enumerate(OCT_TABLE))
+
+
+def _store(result, out):
+    if out is None:
+        return result
+    memoryview(out).cast('B')[:len(result)] = result
+    return out
+
+
+def _ascii(text):
+    ''' text as a bytes-like object (str must be ASCII) '''
+    if isinstance(text, str):
+        return text.encode('ascii')
+    return text
+
+
+''' Hexadecimal '''
+
+def to_hex(data, out=None):
+    return _store(binascii.hexlify(data), out)
+
+def from_hex(text, out=None):
+    ''' raises ValueError (binascii.Error) on odd length or non hex digits '''
+    return _store(binascii.unhexlify(text), out)
+
+
+''' Base64 '''
+
+def to_base64(data, out=None):
+    return _store(binascii.b2a_base64(data, newline=False), out)
+
+def from_base64(text, out=None):
+    ''' strict: raises ValueError (binascii.Error) on any invalid input '''
+    return _store(binascii.a2b_base64(text, strict_mode=True), out)
+
+
+''' Bits '''
+
+def to_bits(data, out=None):
+    n = len(data)
+    if not n:
+        return _store(b'', out)
+    value = int.from_bytes(data, 'big')
+    return _store(format(value, '0{}b'.format(8 * n)).encode('ascii'), out)
+
+def from_bits(text, out=None):
+    text = _ascii(text)
+    if len(text) % 8:
+        raise ValueError('Bit strings must have a multiple of 8 digits')
+    if not text:
+        return _store(b'', out)
+    return _store(int(text, 2).to_bytes(len(text) // 8, 'big'), out)
+
+
+''' Octal (3 digits per byte) '''
+
+def to_oct(data, out=None):
+    return _store(b''.join(map(OCT_TABLE.__getitem__, memoryview(data).cast('B'))), out)
+
+def from_oct(text, out=None):
+    text = bytes(_ascii(text))
+    if len(text) % 3:
+        raise ValueError('Octal strings must have 3 digits per byte')
+    try:
+        result = bytes(map(_OCT_VALUES.__getitem__,
+                           map(text.__getitem__, map(slice, range(0, len(text), 3),
+                                                     range(3, len(text) + 3, 3)))))
+    except KeyError:
+        raise ValueError('Invalid octal digits') from None
+    return _store(result, out)
+
+
+''' Decimal (the bytes as one big-endian unsigned integer) '''
+
+def to_dec(data):
+    return int.from_bytes(data, 'big')
+
+def from_dec(value, length=None, out=None):
+    '''
+        param
+            value: non-negative int (or its decimal digits)
+            length (optional): size of the result, default the fewest
+                               bytes that hold value
+    '''
+    value = int(value)
+    if length is None:
+        length = max(1, (value.bit_length() + 7) // 8)
+    return _store(value.to_bytes(length, 'big'), out)
+
+
+if __name__ == "__main__":
+    # execute only if run as a script
+    pass
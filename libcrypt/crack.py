@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+''' Single-byte XOR key recovery
+
+    Every key is scored from the byte histogram of the ciphertext rather
+    than by decrypting: plaintext byte p = c ^ k, so the score of key k is
+    sum(count[c] * weight[c ^ k]) over the distinct ciphertext bytes c.
+    The weight[c ^ k] rows are precomputed as a 256x256 table.
+'''
+
+import collections
+import functools
+
+from libcrypt import freqmodel, instrument
+from libcrypt.scoring import score_many
+from libcrypt.xor import single_byte_xor
+
+
+@functools.lru_cache(maxsize=8)
+def score_table(weights):
+    ''' table[k][c] is the weight of the plaintext byte c ^ k '''
+    return tuple(tuple(weights[c ^ k] for c in range(256)) for k in range(256))
+
+
+def score_keys(ciphertext, weights=None):
+    '''
+        param
+            ciphertext: buffer
+            weights (optional): 256 per-byte plaintext weights (default:
+                                freqmodel.model())
+        return
+            list of 256 scores, indexed by key
+    '''
+    if weights is None:
+        weights = freqmodel.model()
+    histogram = collections.Counter(bytes(ciphertext)).items()
+    return [sum(count * row[c] for c, count in histogram)
+            for row in score_table(tuple(weights))]
+
+
+@instrument.timed('crack.single_byte_xor')
+def crack_single_byte_xor(ciphertext, weights=None, top=None,
+                          metrics=None, **options):
+    '''
+        param
+            ciphertext: buffer XORed against a single byte
+            weights (optional): 256 per-byte plaintext weights (default:
+                                freqmodel.model())
+            top (optional): only return the best `top` candidates
+            metrics (optional): rank the 256 decryptions with
+                                scoring.score_many instead; the score is
+                                then a tuple and options are passed on
+        return
+            [(key, score, plaintext), ...] ranked by descending score
+    '''
+    if metrics:
+        plaintexts = [single_byte_xor(ciphertext, k) for k in range(256)]
+        scores = score_many(plaintexts, metrics, **options)
+    else:
+        scores = score_keys(ciphertext, weights)
+    ranked = sorted(range(256), key=scores.__getitem__, reverse=True)
+    if top is not None:
+        ranked = ranked[:top]
+    return [(k, scores[k], single_byte_xor(ciphertext, k)) for k in ranked]
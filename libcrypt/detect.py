@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+''' Detect single-character XOR among many hex encoded lines
+
+    Lines are read lazily, grouped into chunks and scored on a process
+    pool; every chunk only returns its own top-K candidates and the caller
+    keeps a bounded heap, so memory stays flat whatever the input size.
+
+    The key of every line is found with the cheap frequency score, but
+    lines are ranked by the chi-squared statistic of their best plaintext
+    per byte: unlike a per-byte frequency sum it penalizes short or
+    degenerate plaintexts (a single space, the same letter repeated) that
+    cannot look like English. Plaintexts that are not mostly printable and
+    lines shorter than min_length bytes are not ranked at all.
+'''
+
+import collections
+import heapq
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from libcrypt import instrument
+from libcrypt.crack import crack_single_byte_xor
+from libcrypt.scoring import REJECTED, score_many
+
+CHUNK_SIZE = 4096
+MIN_LENGTH = 8
+
+
+def score_chunk(start, lines, top, min_length=MIN_LENGTH):
+    '''
+        param
+            start: line number of the first line in the chunk
+            lines: hex encoded ciphertexts
+            top: number of candidates to keep
+            min_length (optional): skip lines shorter than this (in bytes)
+        return
+            the best `top` (score, lineno, key, plaintext) tuples, where
+            score is minus the chi-squared statistic of the plaintext
+            divided by the line length
+    '''
+    best = []
+    for lineno, line in enumerate(lines, start):
+        try:
+            ciphertext = bytes.fromhex(line)
+        except ValueError:
+            continue
+        if not ciphertext or len(ciphertext) < min_length:
+            continue
+        key, _, plaintext = crack_single_byte_xor(ciphertext, top=1)[0]
+        (score,), = score_many([plaintext], ('chi2',))
+        if score == REJECTED:
+            continue
+        push(best, (score / len(ciphertext), lineno, key, plaintext), top)
+    return best
+
+
+def push(best, item, top):
+    ''' Add item to the min-heap best, keeping only the `top` largest '''
+    if len(best) < top:
+        heapq.heappush(best, item)
+    elif item > best[0]:
+        heapq.heapreplace(best, item)
+
+
+def _chunks(lines, size, strip=True):
+    lines = iter(lines)
+    if strip:
+        lines = (line.strip() for line in lines)
+    for start in itertools.count(0, size):
+        chunk = list(itertools.islice(lines, size))
+        if not chunk:
+            return
+        instrument.count('detect.lines', len(chunk))
+        yield start, chunk
+
+
+@instrument.timed('detect.scan')
+def scan(lines, score, top, workers=None, chunk_size=CHUNK_SIZE, args=(),
+         strip=True):
+    '''
+        Run score(start, chunk, top, *args) over chunks of lines (stripped
+        unless strip is false), in-process or on a process pool with a
+        bounded number of chunks in flight, and merge the per-chunk results
+        into the overall top.
+        return
+            the `top` largest items, best first
+    '''
+    workers = workers or os.cpu_count() or 1
+    best = []
+    if workers == 1:
+        for start, chunk in _chunks(lines, chunk_size, strip):
+            for item in score(start, chunk, top, *args):
+                push(best, item, top)
+    else:
+        with ProcessPoolExecutor(workers) as pool:
+            pending = collections.deque()
+            for start, chunk in _chunks(lines, chunk_size, strip):
+                pending.append(pool.submit(score, start, chunk, top, *args))
+                if len(pending) >= 2 * workers:
+                    for item in pending.popleft().result():
+                        push(best, item, top)
+            for future in pending:
+                for item in future.result():
+                    push(best, item, top)
+    return sorted(best, reverse=True)
+
+
+def detect(lines, top=5, workers=None, chunk_size=CHUNK_SIZE,
+           min_length=MIN_LENGTH):
+    '''
+        param
+            lines: iterable of hex strings (e.g. an open file or sys.stdin)
+            top (optional): number of candidates to report
+            workers (optional): processes to use, 1 scores in-process
+            chunk_size (optional): lines sent to a worker at a time
+            min_length (optional): shorter lines (in bytes) are skipped
+        return
+            [(score, lineno, key, plaintext), ...] best first
+    '''
+    return scan(lines, score_chunk, top, workers, chunk_size, (min_length,))
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+''' Detect ECB-encrypted ciphertexts among many
+
+    ECB encrypts equal plaintext blocks to equal ciphertext blocks, so the
+    candidates are the ciphertexts with repeated 16-byte blocks. Blocks are
+    read-only memoryview slices of the decoded line, which hash by content,
+    so counting the distinct ones with a set copies nothing. Lines go
+    through detect.scan: read lazily, chunked, optionally scored on a
+    process pool, with a bounded top-K heap.
+'''
+
+import base64
+import binascii
+import sys
+
+from libcrypt.detect import CHUNK_SIZE, push, scan
+
+BLOCK_SIZE = 16
+
+DECODERS = {
+    'hex': bytes.fromhex,
+    'base64': base64.b64decode,
+    'raw': bytes,
+}
+
+
+def repeated_blocks(ciphertext, block_size=BLOCK_SIZE):
+    '''
+        param
+            ciphertext: buffer
+            block_size (optional): block size in bytes
+        return
+            number of whole blocks that repeat an earlier one
+    '''
+    view = memoryview(ciphertext).cast('B').toreadonly()
+    n = len(view) - len(view) % block_size
+    starts = range(0, n, block_size)
+    ends = range(block_size, n + block_size, block_size)
+    return len(starts) - len(set(map(view.__getitem__, map(slice, starts, ends))))
+
+
+def score_chunk(start, lines, top, encoding='hex', block_size=BLOCK_SIZE):
+    '''
+        return
+            the best `top` (repeats, lineno, ciphertext) tuples of the
+            chunk, only for lines with at least one repeated block
+    '''
+    decode = DECODERS[encoding]
+    best = []
+    for lineno, line in enumerate(lines, start):
+        try:
+            ciphertext = decode(line)
+        except (ValueError, binascii.Error):
+            continue
+        repeats = repeated_blocks(ciphertext, block_size)
+        if repeats:
+            push(best, (repeats, lineno, ciphertext), top)
+    return best
+
+
+def detect_ecb(lines, top=5, encoding='hex', block_size=BLOCK_SIZE,
+               workers=None, chunk_size=CHUNK_SIZE):
+    '''
+        param
+            lines: iterable of ciphertexts, one per item (e.g. an open file)
+            top (optional): number of candidates to report
+            encoding (optional): 'hex', 'base64' or 'raw' (bytes items,
+                                 not stripped)
+            block_size (optional): cipher block size in bytes
+            workers (optional): processes to use, 1 scans in-process
+            chunk_size (optional): lines sent to a worker at a time
+        return
+            [(repeats, lineno, ciphertext), ...] most repeats first
+    '''
+    if encoding not in DECODERS:
+        raise ValueError('Unknown encoding {!r}'.format(encoding))
+    return scan(lines, score_chunk, top, workers, chunk_size,
+                args=(encoding, block_size), strip=encoding != 'raw')
+
+
+if __name__ == "__main__":
+    # execute only if run as a script
+    with open(sys.argv[1]) as f:
+        for repeats, lineno, ciphertext in detect_ecb(f):
+            print(lineno, repeats, ciphertext.hex())
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+''' Character frequency model
+
+    The model is built once from a local corpus and stored as a small
+    versioned binary file:
+
+        header ('<4sHH': magic, version, entries) | 256 float32 frequencies
+
+    model() loads it lazily on first use and keeps it in-process, so
+    scorers start in milliseconds. When no model file exists the bundled
+    FREQ_ENG table is used instead. Frequencies are array('d') tables
+    indexed by byte value.
+
+    Bigram and trigram log-probabilities are counted in the same chunked
+    pass over the corpus and stored in a second, mmap-able file:
+
+        header ('<4sHHIIff': magic, version, reserved, slots, trigrams,
+                bigram floor, trigram floor)
+        65536 float32 bigram log-probabilities, indexed by (a << 8) | b
+        slots uint32 trigram keys ((a << 16) | (b << 8) | c, or EMPTY)
+        slots float32 trigram log-probabilities
+
+    Trigrams live in an open-addressing hash table (Fibonacci hashing,
+    linear probing), so lookups are O(1) without a dict in memory.
+'''
+
+import collections
+import itertools
+import math
+import mmap
+import operator
+import os
+import struct
+import sys
+from array import array
+
+from libcrypt.lcrypt import FREQ_ENG_BYTES
+
+MAGIC = b'FREQ'
+VERSION = 1
+header = struct.Struct('<4sHH')
+unigrams = struct.Struct('<256f')
+
+NGRAM_MAGIC = b'NGRM'
+ngram_header = struct.Struct('<4sHHIIff')
+EMPTY = 0xffffffff
+
+DEFAULT_MODEL = os.path.join(os.path.expanduser('~'), '.cache', 'cryptopals',
+                             'english.freq')
+DEFAULT_NGRAMS = os.path.join(os.path.dirname(DEFAULT_MODEL), 'english.ngrams')
+CHUNK_SIZE = 1 << 20
+
+_models = {}
+_ngram_models = {}
+
+
+def count_bytes(path, chunk_size=CHUNK_SIZE):
+    ''' Count every byte value of the file, reading it in chunks '''
+    counts = [0] * 256
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            for b, n in collections.Counter(chunk).items():
+                counts[b] += n
+    return counts
+
+
+def count_ngrams(path, chunk_size=CHUNK_SIZE):
+    '''
+        Count unigrams, bigrams and trigrams of the file in one pass.
+
+        The file is read in chunks; the last two bytes of each chunk are
+        carried over so n-grams spanning chunk boundaries are counted
+        exactly once. Keys are ints built with map() over the raw bytes,
+        so the counting itself runs in C.
+
+        return
+            (256 unigram counts, 65536 bigram counts, trigram Counter)
+    '''
+    counts, pairs, triples = [0] * 256, [0] * 65536, collections.Counter()
+    tail = b''
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            for b, n in collections.Counter(chunk).items():
+                counts[b] += n
+            data = tail + chunk
+            d2 = data[max(len(tail) - 1, 0):]
+            for key, n in collections.Counter(map(operator.or_,
+                    map(operator.lshift, d2, itertools.repeat(8)),
+                    d2[1:])).items():
+                pairs[key] += n
+            d3 = data[max(len(tail) - 2, 0):]
+            triples.update(map(operator.or_, map(operator.or_,
+                map(operator.lshift, d3, itertools.repeat(16)),
+                map(operator.lshift, d3[1:], itertools.repeat(8))), d3[2:]))
+            tail = data[-2:]
+    return counts, pairs, triples
+
+
+def build(path):
+    '''
+        Return the 256 byte frequencies of the corpus at path.
+
+        As in the original freqchars(), only ASCII is counted, letters are
+        counted case-insensitively and upper case letters get the
+        frequency of their lower case form.
+    '''
+    return frequencies(count_bytes(path))
+
+
+def frequencies(counts):
+    ''' Turn 256 raw byte counts into frequencies, as described in build() '''
+    counts = list(counts)
+    counts[128:] = [0] * 128
+    for c in range(ord('A'), ord('Z') + 1):
+        counts[c + 32] += counts[c]
+        counts[c] = 0
+    total = float(sum(counts)) or 1.0
+    freqs = [n / total for n in counts]
+    for c in range(ord('A'), ord('Z') + 1):
+        freqs[c] = freqs[c + 32]
+    return freqs
+
+
+def save(freqs, path=DEFAULT_MODEL):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(header.pack(MAGIC, VERSION, 256))
+        f.write(unigrams.pack(*freqs))
+    os.replace(tmp, path)
+    _models.pop(path, None)
+
+
+def load(path=DEFAULT_MODEL):
+    with open(path, 'rb') as f:
+        data = f.read()
+    magic, version, entries = header.unpack_from(data)
+    if magic != MAGIC or version != VERSION or entries != 256:
+        raise ValueError('Unknown frequency model format: {}'.format(path))
+    return array('d', unigrams.unpack_from(data, header.size))
+
+
+def model(path=DEFAULT_MODEL):
+    ''' The frequencies stored at path (or FREQ_ENG), loaded once '''
+    freqs = _models.get(path)
+    if freqs is None:
+        freqs = load(path) if os.path.isfile(path) else FREQ_ENG_BYTES
+        _models[path] = freqs
+    return freqs
+
+
+def clear():
+    _models.clear()
+    _ngram_models.clear()
+
+
+def _slot(key, shift):
+    return ((key * 2654435761) & 0xffffffff) >> shift
+
+
+class HashedTable(object):
+    ''' Read-only open-addressing table of uint32 keys to float values '''
+
+    def __init__(self, keys, values, floor):
+        self.keys = keys
+        self.values = values
+        self.floor = floor
+        self.mask = len(keys) - 1
+        self.shift = 32 - self.mask.bit_length()
+
+    def __len__(self):
+        return sum(1 for k in self.keys if k != EMPTY)
+
+    def get(self, key, default=None):
+        keys, i = self.keys, _slot(key, self.shift)
+        while True:
+            k = keys[i]
+            if k == key:
+                return self.values[i]
+            if k == EMPTY:
+                return self.floor if default is None else default
+            i = (i + 1) & self.mask
+
+
+class NgramModel(object):
+    '''
+        Bigram and trigram log-probabilities.
+
+        bigrams is a dense 65536-entry sequence indexed by (a << 8) | b and
+        trigrams a HashedTable keyed by (a << 16) | (b << 8) | c; both plug
+        straight into the scoring bigram/trigram metrics.
+    '''
+
+    def __init__(self, buf):
+        view = memoryview(buf)
+        magic, version, _, slots, _, bigram_floor, trigram_floor = (
+            ngram_header.unpack_from(view))
+        if magic != NGRAM_MAGIC or version != VERSION:
+            raise ValueError('Unknown n-gram model format')
+        start = ngram_header.size
+        self.bigrams = view[start:start + 4 * 65536].cast('f')
+        start += 4 * 65536
+        keys = view[start:start + 4 * slots].cast('I')
+        values = view[start + 4 * slots:start + 8 * slots].cast('f')
+        self.bigram_floor = bigram_floor
+        self.trigrams = HashedTable(keys, values, trigram_floor)
+
+    def bigram(self, a, b):
+        return self.bigrams[(a << 8) | b]
+
+    def trigram(self, a, b, c):
+        return self.trigrams.get((a << 16) | (b << 8) | c)
+
+    @classmethod
+    def open(cls, path=DEFAULT_NGRAMS):
+        ''' Memory-map the model file (read and converted on big endian) '''
+        with open(path, 'rb') as f:
+            if sys.byteorder == 'little':
+                return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+            data = f.read()
+        head, body = data[:ngram_header.size], array('f', data[ngram_header.size:])
+        body.byteswap()
+        return cls(head + body.tobytes())
+
+
+def save_ngrams(pairs, triples, path=DEFAULT_NGRAMS):
+    '''
+        Store bigram counts (65536 list) and trigram counts (mapping) as
+        log-probabilities. Unseen n-grams get log(0.5 / total).
+    '''
+    total = float(sum(pairs)) or 1.0
+    bigram_floor = math.log(0.5 / total)
+    bigrams = array('f', (math.log(n / total) if n else bigram_floor
+                          for n in pairs))
+
+    total = float(sum(triples.values())) or 1.0
+    trigram_floor = math.log(0.5 / total)
+    slots = 1
+    while slots < 2 * len(triples):
+        slots <<= 1
+    mask, shift = slots - 1, 32 - (slots - 1).bit_length()
+    keys = array('I', [EMPTY]) * slots
+    values = array('f', [trigram_floor]) * slots
+    for key, n in triples.items():
+        i = _slot(key, shift)
+        while keys[i] != EMPTY:
+            i = (i + 1) & mask
+        keys[i], values[i] = key, math.log(n / total)
+
+    if sys.byteorder == 'big':
+        for table in (bigrams, keys, values):
+            table.byteswap()
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(ngram_header.pack(NGRAM_MAGIC, VERSION, 0, slots, len(triples),
+                                  bigram_floor, trigram_floor))
+        for table in (bigrams, keys, values):
+            f.write(table.tobytes())
+    os.replace(tmp, path)
+    _ngram_models.pop(path, None)
+
+
+def build_models(corpus, path=DEFAULT_MODEL, ngrams_path=DEFAULT_NGRAMS):
+    ''' Build and store both models from a single pass over corpus '''
+    counts, pairs, triples = count_ngrams(corpus)
+    save(frequencies(counts), path)
+    save_ngrams(pairs, triples, ngrams_path)
+
+
+def ngram_model(path=DEFAULT_NGRAMS):
+    ''' The NgramModel stored at path, mapped once; None if there is none '''
+    model_ = _ngram_models.get(path)
+    if model_ is None and os.path.isfile(path):
+        model_ = _ngram_models[path] = NgramModel.open(path)
+    return model_
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+''' Hamming distance (number of differing bits) between byte buffers
+
+    Buffers are XORed as big integers and the set bits counted with
+    int.bit_count(), so no per-byte Python loop runs. POPCOUNT is the
+    8-bit table for callers that already work byte by byte.
+'''
+
+POPCOUNT = bytes(bin(b).count('1') for b in range(256))
+
+
+def popcount(data):
+    ''' Number of set bits in the buffer '''
+    return int.from_bytes(data, 'little').bit_count()
+
+
+def hamming(a, b):
+    '''
+        param
+            a, b: equal-length buffers (bytes, bytearray, memoryview)
+        return
+            number of differing bits
+    '''
+    if len(a) != len(b):
+        raise ValueError('Buffers must have the same length')
+    return (int.from_bytes(a, 'little') ^ int.from_bytes(b, 'little')).bit_count()
+
+
+def normalized_hamming(a, b):
+    ''' Differing bits per byte '''
+    return hamming(a, b) / len(a) if len(a) else 0.0
+
+
+def blocks(data, size):
+    ''' The whole size-byte blocks of data, as memoryviews (no copies) '''
+    view = memoryview(data).cast('B')
+    return [view[i:i + size] for i in range(0, len(view) - size + 1, size)]
+
+
+def distance_matrix(items):
+    '''
+        param
+            items: sequence of equal-length buffers
+        return
+            N x N list of lists of pairwise distances (symmetric)
+    '''
+    if len(set(len(x) for x in items)) > 1:
+        raise ValueError('Buffers must have the same length')
+    ints = [int.from_bytes(x, 'little') for x in items]
+    n = len(ints)
+    matrix = [[0] * n for _ in range(n)]
+    for i in range(n):
+        x, row = ints[i], matrix[i]
+        for j in range(i + 1, n):
+            row[j] = matrix[j][i] = (x ^ ints[j]).bit_count()
+    return matrix
+
+
+def shifted_distance(data, shift):
+    '''
+        return
+            differing bits per byte between data and data shifted by
+            `shift` bytes (the mean distance over all block pairs `shift`
+            apart), or None if data is too short
+    '''
+    n = len(data) - shift
+    if n <= 0:
+        return None
+    return hamming(data[:n], data[shift:]) / n
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+''' Opt-in timers and counters for the hot paths
+
+    Library stages are wrapped with timed(name) or timer(name) and report
+    volumes with count(name, n). While disabled (the default) a wrapped
+    call costs one flag test and timer() hands back a shared no-op
+    context, so the instrumentation stays in place for good. Enable it
+    with enable() or by setting CRYPTOPALS_INSTRUMENT=1 in the
+    environment, then read snapshot(), dump() it as one JSON line, or let
+    start_dumping() append a line periodically. profile() wraps any code
+    in a cProfile run.
+
+    Any entry point can be run instrumented without editing it:
+        python -m libcrypt.instrument [-o stats.jsonl] [-p out.prof] script.py args
+
+    Numbers are per process: work done in ProcessPoolExecutor workers is
+    not collected.
+'''
+
+import argparse
+import collections
+import contextlib
+import cProfile
+import functools
+import json
+import os
+import pstats
+import runpy
+import sys
+import threading
+import time
+
+enabled = os.environ.get('CRYPTOPALS_INSTRUMENT', '') not in ('', '0')
+
+_lock = threading.Lock()
+_timers = {}                         # name -> [calls, seconds]
+_counters = collections.Counter()
+_gauges = {}                         # name -> callable returning a value
+_NULL = contextlib.nullcontext()
+
+
+def enable():
+    global enabled
+    enabled = True
+
+
+def disable():
+    global enabled
+    enabled = False
+
+
+def reset():
+    ''' Drop all timings and counts (gauges stay registered) '''
+    with _lock:
+        _timers.clear()
+        _counters.clear()
+
+
+def _record(name, seconds):
+    with _lock:
+        entry = _timers.get(name)
+        if entry is None:
+            _timers[name] = [1, seconds]
+        else:
+            entry[0] += 1
+            entry[1] += seconds
+
+
+def count(name, n=1):
+    if enabled:
+        with _lock:
+            _counters[name] += n
+
+
+class _Timer(object):
+
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        _record(self.name, time.perf_counter() - self.start)
+
+
+def timer(name):
+    ''' Context manager timing its block under name (no-op when disabled) '''
+    return _Timer(name) if enabled else _NULL
+
+
+def timed(name):
+    ''' Decorator timing every call of the function under name '''
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _record(name, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+def gauge(name, func):
+    ''' Register func() to be sampled into every snapshot (e.g. cache stats) '''
+    _gauges[name] = func
+
+
+def snapshot():
+    '''
+        return
+            {'time': epoch seconds,
+             'timers': {name: {'calls': n, 'seconds': s, 'mean': s / n}},
+             'counters': {name: n},
+             'gauges': {name: value}}
+    '''
+    with _lock:
+        timers = dict((name, {'calls': calls, 'seconds': seconds,
+                              'mean': seconds / calls})
+                      for name, (calls, seconds) in _timers.items())
+        counters = dict(_counters)
+    return {
+        'time': time.time(),
+        'timers': timers,
+        'counters': counters,
+        'gauges': dict((name, func()) for name, func in _gauges.items()),
+    }
+
+
+def dump(path):
+    ''' Append the current snapshot to path as one JSON line '''
+    line = json.dumps(snapshot(), sort_keys=True)
+    with open(path, 'a') as f:
+        f.write(line + '\n')
+
+
+class Dumper(threading.Thread):
+    ''' Daemon thread calling dump(path) every interval seconds until stop() '''
+
+    def __init__(self, path, interval):
+        super().__init__(daemon=True)
+        self.path = path
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            dump(self.path)
+
+    def stop(self):
+        ''' Stop the thread and write a last line '''
+        self.stopped.set()
+        self.join()
+        dump(self.path)
+
+
+def start_dumping(path, interval=10.0):
+    dumper = Dumper(path, interval)
+    dumper.start()
+    return dumper
+
+
+@contextlib.contextmanager
+def profile(path=None, sort='cumulative', limit=30, stream=None):
+    '''
+        Run the block under cProfile.
+
+        param
+            path (optional): write the raw stats there (for pstats/snakeviz)
+            sort, limit (optional): otherwise print the top `limit`
+                                    functions by `sort` to stream
+                                    (default stderr)
+    '''
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        if path is not None:
+            profiler.dump_stats(path)
+        else:
+            stats = pstats.Stats(profiler, stream=stream or sys.stderr)
+            stats.sort_stats(sort).print_stats(limit)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m libcrypt.instrument')
+    parser.add_argument('-o', '--output', help='append snapshots to this JSON lines file')
+    parser.add_argument('-i', '--interval', type=float,
+                        help='with -o, also dump every INTERVAL seconds')
+    parser.add_argument('-p', '--profile', help='write cProfile stats to this file')
+    parser.add_argument('script')
+    parser.add_argument('args', nargs=argparse.REMAINDER)
+    args = parser.parse_args(argv)
+
+    enable()
+    dumper = None
+    if args.output and args.interval:
+        dumper = start_dumping(args.output, args.interval)
+    sys.argv = [args.script] + args.args
+    try:
+        with profile(args.profile) if args.profile else _NULL:
+            runpy.run_path(args.script, run_name='__main__')
+    finally:
+        if dumper is not None:
+            dumper.stop()
+        elif args.output:
+            dump(args.output)
+        else:
+            json.dump(snapshot(), sys.stderr, indent=2, sort_keys=True)
+            sys.stderr.write('\n')
+
+
+if __name__ == "__main__":
+    # execute only if run as a script; register this module under its
+    # import name so the library and the script share one set of timers
+    sys.modules.setdefault('libcrypt.instrument', sys.modules[__name__])
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+''' Repeating-key XOR: encryption and breaking
+
+    Key size estimation compares the ciphertext with itself shifted by the
+    candidate size: for the right size both sides are XORed with the same
+    key byte, so the distance is that of the plaintext, which is low. The
+    whole shifted buffer goes through hamming.shifted_distance, so each
+    candidate costs a handful of C calls.
+
+    Columns are taken with extended slicing (ciphertext[i::keysize]) and
+    every column is solved with the single-byte cracker, on a process pool
+    for large inputs.
+'''
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from libcrypt import instrument
+from libcrypt.crack import crack_single_byte_xor
+from libcrypt.hamming import shifted_distance
+from libcrypt.scoring import frequency
+from libcrypt.xor import repeating_key_xor
+
+PARALLEL_THRESHOLD = 1 << 20
+
+
+def encrypt(data, key):
+    return repeating_key_xor(data, key)
+
+
+decrypt = encrypt
+
+
+def keysizes(ciphertext, max_keysize=40, sample=1 << 16):
+    '''
+        param
+            ciphertext: buffer
+            max_keysize (optional): largest key size tried
+            sample (optional): only look at the first `sample` bytes
+        return
+            [(distance, keysize), ...] best (lowest distance) first
+    '''
+    data = bytes(ciphertext[:sample + max_keysize])
+    ranked = []
+    for keysize in range(1, max_keysize + 1):
+        distance = shifted_distance(data, keysize)
+        if distance is not None:
+            ranked.append((distance, keysize))
+    return sorted(ranked)
+
+
+def period(key):
+    ''' Shortest prefix of key that repeats to the whole key '''
+    for p in range(1, len(key)):
+        if len(key) % p == 0 and key[:p] * (len(key) // p) == key:
+            return key[:p]
+    return key
+
+
+def solve_column(column):
+    return crack_single_byte_xor(column, top=1)[0][0]
+
+
+def solve_key(ciphertext, keysize, workers=None, threshold=PARALLEL_THRESHOLD):
+    ''' The most likely key of the given size '''
+    data = bytes(ciphertext)
+    columns = [data[i::keysize] for i in range(keysize)]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or keysize == 1 or len(data) < threshold:
+        return bytes(map(solve_column, columns))
+    with ProcessPoolExecutor(min(workers, keysize)) as pool:
+        return bytes(pool.map(solve_column, columns))
+
+
+@instrument.timed('repxor.break')
+def break_repeating_key_xor(ciphertext, max_keysize=40, candidates=3,
+                            workers=None, threshold=PARALLEL_THRESHOLD):
+    '''
+        param
+            ciphertext: buffer encrypted with repeating-key XOR
+            max_keysize (optional): largest key size tried
+            candidates (optional): number of best key sizes to solve
+            workers, threshold (optional): process pool settings
+        return
+            (key, plaintext) with the best English score per byte
+    '''
+    best = None
+    for _, keysize in keysizes(ciphertext, max_keysize)[:candidates]:
+        key = period(solve_key(ciphertext, keysize, workers, threshold))
+        plaintext = decrypt(ciphertext, key)
+        score = frequency(plaintext) / max(len(plaintext), 1)
+        if best is None or (score, -len(key)) > best[0]:
+            best = ((score, -len(key)), key, plaintext)
+    return best[1], best[2]
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+''' Plaintext scoring
+
+    Metrics (every one of them: higher means more English-like); the
+    unigram ones default to freqmodel.model(), i.e. the stored model or
+    the bundled FREQ_ENG table, with the log and chi-squared tables
+    derived from whichever is loaded:
+        frequency   sum of byte frequencies
+        chi2        minus the chi-squared distance to English
+        loglik      log-likelihood under the unigram model
+        bigram      log-likelihood under a bigram table
+        trigram     log-likelihood under a trigram table
+
+    score_many() scores N candidates in one call. Candidates below the
+    printable ratio are rejected before any metric runs, metrics run
+    cheapest first, and keep= limits the expensive ones to the best
+    candidates of the cheapest one.
+'''
+
+import collections
+import math
+import string
+from array import array
+
+from libcrypt import freqmodel, instrument
+
+PRINTABLE = string.printable.encode('ascii')
+REJECTED = float('-inf')
+
+# unigram weights -> (weights, log table, chi-squared table), keyed by
+# id() and holding the weights so the id cannot be reused meanwhile
+_derived = {}
+_DERIVED_SIZE = 8
+
+
+def _unigram_tables(weights=None):
+    if weights is None:
+        weights = freqmodel.model()
+    entry = _derived.get(id(weights))
+    if entry is None or entry[0] is not weights:
+        floor = min((w for w in weights if w), default=1.0) / 10
+        total = sum(weights) or 1.0
+        chi_floor = min((w / total for w in weights if w), default=1.0) / 10
+        entry = (weights,
+                 array('d', (math.log(max(w, floor)) for w in weights)),
+                 tuple(max(w / total, chi_floor) for w in weights))
+        if len(_derived) >= _DERIVED_SIZE:
+            _derived.clear()
+        _derived[id(weights)] = entry
+    return entry
+
+
+def log_weights(weights=None):
+    ''' Floored log of weights (default: the loaded freqmodel.model()) '''
+    return _unigram_tables(weights)[1]
+
+
+def chi_expected(weights=None):
+    ''' weights normalized and floored for chi2 (default: freqmodel.model()) '''
+    return _unigram_tables(weights)[2]
+
+
+def printable_ratio(data):
+    if not data:
+        return 1.0
+    return 1.0 - len(bytes(data).translate(None, PRINTABLE)) / len(data)
+
+
+def frequency(data, weights=None):
+    if weights is None:
+        weights = freqmodel.model()
+    return sum(n * weights[b] for b, n in collections.Counter(bytes(data)).items())
+
+
+def chi2(data, expected=None):
+    ''' minus the chi-squared statistic of the byte counts of data '''
+    if expected is None:
+        expected = chi_expected()
+    length = len(data)
+    if not length:
+        return 0.0
+    total, seen = 0.0, 0.0
+    for b, n in collections.Counter(bytes(data)).items():
+        e = length * expected[b]
+        total += (n - e) * (n - e) / e
+        seen += expected[b]
+    # every byte value never observed contributes (0 - e)^2 / e = e
+    return -(total + length * (sum(expected) - seen))
+
+
+def loglik(data, logp=None):
+    if logp is None:
+        logp = log_weights()
+    return sum(n * logp[b] for b, n in collections.Counter(bytes(data)).items())
+
+
+# log-probability of an n-gram missing from a table without its own floor
+FLOOR = -20.0
+
+
+def bigram(data, table, floor=None):
+    '''
+        table maps (a << 8) | b to the log-probability of the pair a, b:
+        a dense 65536-entry sequence or anything with a get() method.
+    '''
+    if floor is None:
+        floor = getattr(table, 'floor', FLOOR)
+    data = bytes(data)
+    pairs = collections.Counter(zip(data, data[1:])).items()
+    if hasattr(table, 'get'):
+        return sum(n * table.get((a << 8) | b, floor) for (a, b), n in pairs)
+    return sum(n * table[(a << 8) | b] for (a, b), n in pairs)
+
+
+def trigram(data, table, floor=None):
+    ''' table.get((a << 16) | (b << 8) | c, floor) is a log-probability '''
+    if floor is None:
+        floor = getattr(table, 'floor', FLOOR)
+    data = bytes(data)
+    triples = collections.Counter(zip(data, data[1:], data[2:])).items()
+    return sum(n * table.get((a << 16) | (b << 8) | c, floor)
+               for (a, b, c), n in triples)
+
+
+# relative cost, used to run the cheap metrics first
+METRICS = {
+    'frequency': (1, frequency),
+    'loglik': (1, loglik),
+    'chi2': (2, chi2),
+    'bigram': (3, bigram),
+    'trigram': (4, trigram),
+}
+
+
+def _table(name, tables):
+    if name in tables:
+        return tables[name]
+    model = freqmodel.ngram_model()
+    if model is None:
+        raise ValueError('No {} table given and no n-gram model stored'.format(name))
+    return model.bigrams if name == 'bigram' else model.trigrams
+
+
+def rows(buf, width):
+    ''' Split a flat buffer into width-sized rows, without copying '''
+    view = memoryview(buf).cast('B')
+    return [view[i:i + width] for i in range(0, len(view), width)]
+
+
+@instrument.timed('scoring.score_many')
+def score_many(candidates, metrics=('frequency',), min_printable=0.9,
+               keep=None, width=None, **tables):
+    '''
+        param
+            candidates: sequence of N plaintexts, or a flat buffer of N
+                        rows when width is given
+            metrics (optional): names from METRICS
+            min_printable (optional): reject candidates with a lower
+                                      printable ratio (0 disables)
+            keep (optional): only run the metrics after the cheapest one
+                             on the best `keep` candidates
+            bigram=, trigram= : tables for those metrics (default: the
+                                stored freqmodel.ngram_model())
+        return
+            list of N tuples with one value per metric, in the order
+            given; rejected candidates get REJECTED for every metric and
+            candidates pruned by keep get it for the later metrics
+    '''
+    if width is not None:
+        candidates = rows(candidates, width)
+    candidates = [bytes(c) for c in candidates]
+    order = sorted(metrics, key=lambda m: METRICS[m][0])
+    values = dict((m, [REJECTED] * len(candidates)) for m in metrics)
+
+    alive = [i for i, c in enumerate(candidates)
+             if not min_printable or printable_ratio(c) >= min_printable]
+    instrument.count('scoring.candidates', len(candidates))
+    instrument.count('scoring.rejected', len(candidates) - len(alive))
+    for step, name in enumerate(order):
+        func = METRICS[name][1]
+        args = (_table(name, tables),) if name in ('bigram', 'trigram') else ()
+        column = values[name]
+        for i in alive:
+            column[i] = func(candidates[i], *args)
+        if step == 0 and keep is not None:
+            alive = sorted(alive, key=column.__getitem__, reverse=True)[:keep]
+
+    return [tuple(values[m][i] for m in metrics) for i in range(len(candidates))]
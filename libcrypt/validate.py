@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+''' Input validation for hex, octal, bits and base64
+
+    Digit checks are a single bytes.translate() that deletes every valid
+    digit: the input is valid when nothing is left. Base64 is matched by a
+    module-level compiled pattern, nothing is decoded. Strings are checked
+    through their ASCII encoding, ints are valid when non-negative (any
+    such int has a representation in every base).
+
+    validate_stream() checks an iterable of chunks (e.g. a file read in
+    blocks) in constant memory, and validate_many() checks a list of lines
+    with one translate() over all of them when they are all valid, which
+    is the common case.
+'''
+
+import functools
+import re
+
+HEX_DIGITS = b'0123456789abcdefABCDEF'
+OCT_DIGITS = b'01234567'
+BIT_DIGITS = b'01'
+BASE64_ALPHABET = (b'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz'
+                   b'0123456789+/')
+
+_BASE64 = re.compile(rb'[A-Za-z0-9+/]*={0,2}')
+
+# characters skipped by validate_stream() by default
+NEWLINES = b'\r\n'
+
+CHUNK_SIZE = 1 << 16
+
+
+def _as_bytes(data):
+    ''' data as bytes or bytearray, None for non-ASCII strings '''
+    if isinstance(data, (bytes, bytearray)):
+        return data
+    if isinstance(data, str):
+        return data.encode('ascii') if data.isascii() else None
+    try:
+        return memoryview(data).tobytes()
+    except TypeError:
+        raise ValueError('You must specify a string') from None
+
+
+def _digits(data, digits, prefix, even=False):
+    if isinstance(data, int):
+        return data >= 0
+    data = _as_bytes(data)
+    if data is None:
+        return False
+    if prefix is not None and data[:2].lower() == prefix:
+        data = data[2:]
+    if not data or (even and len(data) % 2):
+        return False
+    return not data.translate(None, digits)
+
+
+def is_hex(data, prefix=True, even=False):
+    '''
+        param
+            data: str, buffer or int
+            prefix (optional): accept a leading 0x
+            even (optional): require an even number of digits (whole bytes)
+    '''
+    return _digits(data, HEX_DIGITS, b'0x' if prefix else None, even)
+
+
+def is_oct(data, prefix=True):
+    return _digits(data, OCT_DIGITS, b'0o' if prefix else None)
+
+
+def is_bits(data, prefix=True):
+    return _digits(data, BIT_DIGITS, b'0b' if prefix else None)
+
+
+def is_base64(data):
+    ''' Standard alphabet, padded to a multiple of 4 characters '''
+    data = _as_bytes(data)
+    if data is None or len(data) % 4:
+        return False
+    return _BASE64.fullmatch(data) is not None
+
+
+VALIDATORS = {
+    'hex': is_hex,
+    'oct': is_oct,
+    'bits': is_bits,
+    'base64': is_base64,
+}
+
+# digit sets of the kinds checked with translate()
+_DIGITS = {
+    'hex': HEX_DIGITS,
+    'oct': OCT_DIGITS,
+    'bits': BIT_DIGITS,
+}
+
+
+def validate_stream(chunks, kind='hex', ignore=NEWLINES):
+    '''
+        param
+            chunks: iterable of buffers or str, the pieces of one input
+            kind (optional): 'hex', 'oct', 'bits' or 'base64'
+            ignore (optional): characters skipped anywhere (line breaks)
+        return
+            True if the concatenation, without the ignored characters, is
+            valid (no 0x/0o/0b prefix); only one chunk is held at a time
+    '''
+    if kind not in VALIDATORS:
+        raise ValueError('Unknown kind {!r}'.format(kind))
+    length = padding = 0
+    for chunk in chunks:
+        chunk = _as_bytes(chunk)
+        if chunk is None:
+            return False
+        chunk = chunk.translate(None, ignore)
+        if kind != 'base64':
+            if chunk.translate(None, _DIGITS[kind]):
+                return False
+        else:
+            if chunk.translate(None, BASE64_ALPHABET + b'='):
+                return False
+            # padding only at the very end, at most two characters
+            if padding and chunk.strip(b'='):
+                return False
+            pad = chunk.find(b'=')
+            if pad >= 0:
+                if chunk[pad:].strip(b'='):
+                    return False
+                padding += len(chunk) - pad
+                if padding > 2:
+                    return False
+        length += len(chunk)
+    if kind == 'base64':
+        return length % 4 == 0
+    return length > 0
+
+
+def validate_file(path, kind='hex', ignore=NEWLINES, chunk_size=CHUNK_SIZE):
+    ''' validate_stream() over a file read in chunk_size blocks '''
+    with open(path, 'rb') as f:
+        return validate_stream(iter(functools.partial(f.read, chunk_size), b''),
+                               kind, ignore)
+
+
+def validate_many(lines, kind='hex'):
+    '''
+        param
+            lines: iterable of str or buffers, one value each
+            kind (optional): 'hex', 'oct', 'bits' or 'base64'
+        return
+            list of bools, one per line (prefixes accepted as in is_hex)
+    '''
+    if kind not in VALIDATORS:
+        raise ValueError('Unknown kind {!r}'.format(kind))
+    lines = list(lines)
+    if kind in _DIGITS and lines and all(map(len, lines)):
+        # all valid, without prefixes: one translate() over the joined lines
+        sep = '\n' if isinstance(lines[0], str) else b'\n'
+        try:
+            blob = _as_bytes(sep.join(lines))
+        except TypeError:
+            blob = None
+        if (blob is not None and blob.count(b'\n') == len(lines) - 1 and
+                not blob.translate(None, _DIGITS[kind] + b'\n')):
+            return [True] * len(lines)
+    return list(map(VALIDATORS[kind], lines))
+
+
+if __name__ == "__main__":
+    # execute only if run as a script
+    pass
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+''' XOR primitives on raw bytes
+
+    All functions accept bytes, bytearray or memoryview (anything exposing
+    the buffer protocol) and return bytes unless an out= buffer is given.
+    Buffers are XORed as single big integers and single-byte XOR is a
+    bytes.translate() with a precomputed table, so no Python level loop
+    runs per byte.
+'''
+
+# XOR_TABLES[k] maps every byte value b to b ^ k, for bytes.translate()
+XOR_TABLES = tuple(bytes(b ^ k for b in range(256)) for k in range(256))
+
+
+def _xor_int(a, b):
+    return int.from_bytes(a, 'little') ^ int.from_bytes(b, 'little')
+
+
+def _store(value, length, out):
+    result = value.to_bytes(length, 'little')
+    if out is None:
+        return result
+    memoryview(out).cast('B')[:length] = result
+    return out
+
+
+def fixed_xor(a, b, out=None):
+    '''
+        param
+            a, b: equal-length buffers
+            out (optional): writable buffer receiving the result
+        return
+            a ^ b as bytes (or out)
+    '''
+    if len(a) != len(b):
+        raise ValueError('Buffers must have the same length')
+    return _store(_xor_int(a, b), len(a), out)
+
+
+def single_byte_xor(data, key, out=None):
+    '''
+        param
+            data: buffer
+            key: int in range(256)
+            out (optional): writable buffer receiving the result
+        return
+            every byte of data XORed with key
+    '''
+    result = bytes(data).translate(XOR_TABLES[key])
+    if out is None:
+        return result
+    memoryview(out).cast('B')[:len(result)] = result
+    return out
+
+
+def repeating_key_xor(data, key, out=None):
+    '''
+        param
+            data: buffer
+            key: non-empty buffer, repeated to the length of data
+            out (optional): writable buffer receiving the result
+        return
+            data XORed with the repeated key
+    '''
+    if not key:
+        raise ValueError('Key must not be empty')
+    n = len(data)
+    stream = (bytes(key) * (n // len(key) + 1))[:n]
+    return _store(_xor_int(data, stream), n, out)
+
+
+def xor_into(buf, other):
+    '''
+        XOR other into the start of the writable buffer buf, in place.
+        return buf
+    '''
+    view = memoryview(buf).cast('B')
+    n = len(other)
+    if n > len(view):
+        raise ValueError('Buffer is shorter than the operand')
+    view[:n] = (_xor_int(view[:n], other)).to_bytes(n, 'little')
+    return buf
@@ -19,14 +19,11 @@ Cryptopals Rule:
     Always operate on raw bytes, never on encoded strings. Only use hex and base64 for pretty-printing.
 
 '''
-import binascii
-import base64
+from libcrypt import codec
 
 def hexToBase64(s):
 
-    decoded = binascii.unhexlify(s)
-    encoded = base64.b64encode(decoded).decode('ascii')
-    return encoded
+    return codec.to_base64(codec.from_hex(s)).decode('ascii')
 
 def main():
     test = "49276d206b696c6c696e6720796f757220627261696e206c696b65206120706f69736f6e6f7573206d757368726f6f6d"
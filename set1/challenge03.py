@@ -21,10 +21,10 @@ Achievement Unlocked
 
     You now have our permission to make "ETAOIN SHRDLU" jokes on Twitter.
 '''
+import binascii
 import string
 
-from libcrypt.hexxor import hexxor
-from libcrypt.freqchars import freqchars
+from libcrypt.crack import crack_single_byte_xor
 
 def is_hex(s):
     hex_digits = set(string.hexdigits)
@@ -37,38 +37,18 @@ def char2hex(c):
 def main():
     
     hextext = "1b37373331363f78151b7f2b783431333d78397828372d363c78373e783a393b3736"
+    ciphertext = binascii.unhexlify(hextext)
     
-    keyspace = string.ascii_letters + string.digits
-    keyshex = dict((el.encode('ascii').hex(),0) for el in list(keyspace))
-    
-    freqhex = freqchars()
-    
-    for keyhex in keyshex:    
-        # 1 Byte length key
-        
-        for (c1, c2) in zip(hextext[0::2], hextext[1::2]):
-            # C1 + C2 is 1 char size or 1 byte
-            ciphertext = c1+c2
-            
-            plaintext_bin = hexxor(ciphertext, keyhex, 'big')
-            plaintext_int = int.from_bytes(plaintext_bin, byteorder='big')
-            plaintext_hex = '{:02x}'.format(plaintext_int)
-            if plaintext_hex in freqhex:
-                keyshex[keyhex] += freqhex[plaintext_hex]
-    
-    keyshex = dict(sorted(keyshex.items(), key=lambda kv: kv[1], reverse=True))
+    keyspace = (string.ascii_letters + string.digits).encode('ascii')
     
     codeascii ="".join(map(chr,range(128)))
     fltr = ''.join([['.', chr(x)][chr(x) in string.printable[:-5]] for x in range(128)])
     
-    for k, v in keyshex.items():
-        ch = bytes.fromhex(k).decode('utf-8')
-        print("ASCII: ""{0:8}""\tHEX: {1:8}\tVALUE: {2:12.8f}\t".format(ch, k, float(v)), end='')
-        
-        for (ch1, ch2) in zip(hextext[0::2], hextext[1::2]):
-            r = hexxor(ch1+ch2, k, 'big').decode("ascii")
-            print(r[-1].translate(str.maketrans(codeascii, fltr)), end='')
-        print("")
+    for k, v, plaintext in crack_single_byte_xor(ciphertext):
+        if k not in keyspace:
+            continue
+        print("ASCII: ""{0:8}""\tHEX: {1:8}\tVALUE: {2:12.8f}\t".format(chr(k), "{:02x}".format(k), v), end='')
+        print(plaintext.decode("latin-1").translate(str.maketrans(codeascii, fltr)))
 
 if __name__ == "__main__":
     # execute only if run as a script
@@ -12,23 +12,20 @@ Find it.
 (Your code from #3 should help.)
 
 '''
-import string
-from libcrypt.common import readfile
-from libcrypt.lcrypt import is_hex, hexxor, freqchars
+import sys
+
+from libcrypt.detect import detect
 
 def main():
-    fname = r"C:\Users\Laptop2\Desktop\tmp\challenge4.txt"
-    lines = readfile(fname)
-    
-    keyspace = string.ascii_letters + string.digits
-    keyshex = dict((el.encode('ascii').hex(),0) for el in list(keyspace))
-    
-    freqhex = freqchars()
+    # hex lines from the file given as argument, or from stdin
+    if len(sys.argv) > 1:
+        with open(sys.argv[1]) as lines:
+            candidates = detect(lines)
+    else:
+        candidates = detect(sys.stdin)
     
-    for line in lines:
-        for (c1, c2) in zip(line[0::2], line[1::2]):
-            # C1 + C2 is 1 char size or 1 byte
-            ciphertext = c1+c2
+    for score, lineno, key, plaintext in candidates:
+        print("LINE: {0:6d}\tKEY: {1:02x}\tSCORE: {2:10.8f}\t{3!r}".format(lineno, key, score, plaintext))
 
 
 if __name__ == "__main__":
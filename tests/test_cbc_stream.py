@@ -0,0 +1,85 @@
+''' CBCEncryptor / CBCDecryptor fed in chunks of awkward sizes '''
+
+import random
+
+import pytest
+
+from aesmod.aes import AES, CBCEncryptor, CBCDecryptor, cbc_encrypt
+from aesmod.fastaes import FastAES
+
+KEY = bytes(range(16))
+IV = bytes(range(16, 32))
+BOUNDARIES = (0, 1, 15, 16, 17)
+
+
+def chunks(data, sizes):
+    ''' Cut data into pieces of the given sizes, cycling through them '''
+    pieces, pos, i = [], 0, 0
+    while pos < len(data):
+        size = sizes[i % len(sizes)]
+        pieces.append(data[pos:pos + size])
+        pos, i = pos + size, i + 1
+    return pieces
+
+
+def stream(transform, pieces, into=False):
+    out = []
+    for piece in pieces:
+        if into:
+            buf = bytearray(transform.output_size(len(piece)))
+            assert transform.update_into(piece, buf) == len(buf)
+            out.append(bytes(buf))
+        else:
+            out.append(transform.update(piece))
+    out.append(transform.finalize())
+    return b''.join(out)
+
+
+@pytest.mark.parametrize('engine', (AES, FastAES))
+@pytest.mark.parametrize('size', BOUNDARIES)
+@pytest.mark.parametrize('into', (False, True))
+def test_chunk_boundaries(engine, size, into):
+    data = random.Random(size).randbytes(100)
+    expected = cbc_encrypt(data, KEY, IV, engine)
+    sizes = [size] + [s for s in BOUNDARIES if s != size]
+    ciphertext = stream(CBCEncryptor(KEY, IV, engine), chunks(data, sizes), into)
+    assert ciphertext == expected
+    plain = stream(CBCDecryptor(KEY, IV, engine), chunks(ciphertext, sizes), into)
+    assert plain == data
+
+
+@pytest.mark.parametrize('length', BOUNDARIES + (32, 33))
+def test_lengths(length):
+    data = bytes(length)
+    ciphertext = stream(CBCEncryptor(KEY, IV), chunks(data, (1,)))
+    assert len(ciphertext) == length - length % 16 + 16
+    assert stream(CBCDecryptor(KEY, IV), chunks(ciphertext, (17, 15))) == data
+
+
+def test_decryptor_holds_back_last_block():
+    ciphertext = cbc_encrypt(bytes(32), KEY, IV)
+    decryptor = CBCDecryptor(KEY, IV)
+    assert decryptor.update(ciphertext[:16]) == b''
+    assert len(decryptor.update(ciphertext[16:])) == 32
+
+
+def test_update_into_small_buffer():
+    encryptor = CBCEncryptor(KEY, IV)
+    with pytest.raises(ValueError):
+        encryptor.update_into(bytes(32), bytearray(16))
+
+
+def test_finalized():
+    encryptor = CBCEncryptor(KEY, IV)
+    encryptor.finalize()
+    with pytest.raises(ValueError):
+        encryptor.update(bytes(16))
+    with pytest.raises(ValueError):
+        encryptor.finalize()
+
+
+def test_bad_padding():
+    decryptor = CBCDecryptor(KEY, IV)
+    decryptor.update(bytes(15))
+    with pytest.raises(ValueError):
+        decryptor.finalize()
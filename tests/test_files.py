@@ -0,0 +1,79 @@
+''' encrypt_file / decrypt_file '''
+
+import os
+
+import pytest
+
+from aesmod import aes
+
+ITERATIONS = 16
+
+
+@pytest.fixture
+def src(tmp_path):
+    path = tmp_path / 'plain'
+    path.write_bytes(os.urandom(3 * aes.FILE_CHUNK_SIZE // 2 + 5))
+    return path
+
+
+def entries(path):
+    return sorted(p.name for p in path.parent.iterdir())
+
+
+@pytest.mark.parametrize('size', (0, 1, 15, 16, 17))
+def test_round_trip(tmp_path, size):
+    src = tmp_path / 'plain'
+    src.write_bytes(os.urandom(size))
+    aes.encrypt_file(src, tmp_path / 'enc', 'pw', ITERATIONS)
+    aes.decrypt_file(tmp_path / 'enc', tmp_path / 'dec', 'pw')
+    assert (tmp_path / 'dec').read_bytes() == src.read_bytes()
+
+
+def test_round_trip_chunks(tmp_path, src):
+    aes.encrypt_file(src, tmp_path / 'enc', 'pw', ITERATIONS)
+    aes.decrypt_file(tmp_path / 'enc', tmp_path / 'dec', 'pw')
+    assert (tmp_path / 'dec').read_bytes() == src.read_bytes()
+    assert entries(src) == ['dec', 'enc', 'plain']
+
+
+def test_wrong_passphrase_leaves_dst(tmp_path, src):
+    aes.encrypt_file(src, tmp_path / 'enc', 'pw', ITERATIONS)
+    dst = tmp_path / 'dst'
+    dst.write_bytes(b'untouched')
+    with pytest.raises(ValueError):
+        aes.decrypt_file(tmp_path / 'enc', dst, 'wrong')
+    assert dst.read_bytes() == b'untouched'
+    assert entries(src) == ['dst', 'enc', 'plain']
+
+
+def test_tampered_file_leaves_no_dst(tmp_path, src):
+    aes.encrypt_file(src, tmp_path / 'enc', 'pw', ITERATIONS)
+    data = bytearray((tmp_path / 'enc').read_bytes())
+    data[-20] ^= 1
+    (tmp_path / 'enc').write_bytes(data)
+    with pytest.raises(ValueError):
+        aes.decrypt_file(tmp_path / 'enc', tmp_path / 'dst', 'pw')
+    assert entries(src) == ['enc', 'plain']
+
+
+def test_rejects_encrypt_envelope(tmp_path):
+    (tmp_path / 'enc').write_bytes(aes.encrypt(b'data', 'pw', ITERATIONS,
+        armored=False))
+    dst = tmp_path / 'dst'
+    dst.write_bytes(b'untouched')
+    with pytest.raises(ValueError):
+        aes.decrypt_file(tmp_path / 'enc', dst, 'pw')
+    assert dst.read_bytes() == b'untouched'
+    assert entries(dst) == ['dst', 'enc']
+
+
+def test_same_file(tmp_path, src):
+    data = src.read_bytes()
+    with pytest.raises(ValueError):
+        aes.encrypt_file(src, src, 'pw', ITERATIONS)
+    aes.encrypt_file(src, tmp_path / 'enc', 'pw', ITERATIONS)
+    with pytest.raises(ValueError):
+        aes.decrypt_file(tmp_path / 'enc', tmp_path / 'enc', 'pw')
+    assert src.read_bytes() == data
+    aes.decrypt_file(tmp_path / 'enc', tmp_path / 'dec', 'pw')
+    assert (tmp_path / 'dec').read_bytes() == data